@@ -6,6 +6,7 @@ set -o errexit
 pip install -r requirements.txt
 python manage.py collectstatic --no-input
 python manage.py migrate
+python manage.py createcachetable
 
 # Create superuser automatically
 python manage.py shell << 'EOF'
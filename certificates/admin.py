@@ -1,11 +1,26 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
 from django.utils.html import format_html
 from django import forms
-from .models import Course, Certificate, Student
-import random
-import string
+from django.contrib.auth.hashers import make_password
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+import csv
+import io
+import os
+from .credentials import reset_student_passwords
+from .jobs import background_threshold, enqueue_job, requeueable
+from .models import Course, Certificate, Job, Student, get_job_storage
+from .export import iter_certificates_zip
+from .paginator import EstimatedCountPaginator
+from .roster import RosterError, import_roster, read_roster_csv
+from .search import search_certificates
+from .signals import certificates_changed
 
 # Customize the User admin
 class CustomUserAdmin(UserAdmin):
@@ -41,16 +56,15 @@ class StudentForm(forms.ModelForm):
         instance = super().save(commit=False)
         
         if not instance.pk:  # New student
+            # Use phone number as the initial password
+            temp_password = self.cleaned_data['phone']
             user = User.objects.create(
                 username=self.cleaned_data['email'],
                 email=self.cleaned_data['email'],
                 first_name=self.cleaned_data['first_name'],
-                last_name=self.cleaned_data['last_name']
+                last_name=self.cleaned_data['last_name'],
+                password=make_password(temp_password)
             )
-            # Use phone number as the initial password
-            temp_password = self.cleaned_data['phone']
-            user.set_password(temp_password)
-            user.save()
             instance.user = user
             instance._temp_password = temp_password
             instance.require_password_change = True
@@ -69,6 +83,20 @@ class StudentForm(forms.ModelForm):
             
         return instance
 
+def queue_job(modeladmin, request, kind, **arguments):
+    """Queue a heavy admin action for run_worker and point the user at it"""
+    job = enqueue_job(kind, created_by=request.user, **arguments)
+    url = reverse('admin:certificates_job_change', args=[job.pk])
+    modeladmin.message_user(request, format_html(
+        'This runs in the background as <a href="{}">{}</a>.', url, job
+    ))
+
+class RosterImportForm(forms.Form):
+    roster = forms.FileField(
+        help_text='CSV with columns email, first_name, last_name, phone and optionally '
+                  'course, grade, start_date, end_date. Rows with a course also get a certificate.'
+    )
+
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
     list_display = ('name', 'duration', 'created_at')
@@ -81,7 +109,26 @@ class CertificateAdmin(admin.ModelAdmin):
     search_fields = ('certificate_id', 'student__user__email', 'student__user__first_name', 
                     'student__user__last_name', 'course__name', 'grade')
     readonly_fields = ('certificate_id',)
-    actions = ['invalidate_certificates', 'revalidate_certificates']
+    autocomplete_fields = ('student', 'course')
+    list_select_related = ('student__user', 'course')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    actions = ['invalidate_certificates', 'revalidate_certificates', 'export_certificates_zip']
+
+    def get_queryset(self, request):
+        # Rows, actions and __str__ all read the student's user and the course
+        return super().get_queryset(request).select_related('student__user', 'course')
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        results = search_certificates(queryset, search_term)
+        # No full-text index on this database, or nothing starting with the
+        # term's words: fall back to substring matching, e.g. for part of an
+        # email or certificate id
+        if results is None or not results.exists():
+            return super().get_search_results(request, queryset, search_term)
+        return results, False
 
     def get_student_name(self, obj):
         return obj.student.user.get_full_name() or obj.student.user.email
@@ -92,24 +139,91 @@ class CertificateAdmin(admin.ModelAdmin):
     formatted_certificate_id.admin_order_field = 'certificate_id'
     formatted_certificate_id.short_description = 'Certificate ID'
 
+    def set_validity(self, request, queryset, is_valid):
+        certificate_pks = list(queryset.values_list('pk', flat=True))
+        if len(certificate_pks) > background_threshold():
+            queue_job(self, request, 'set_certificate_validity', certificate_pks=certificate_pks, is_valid=is_valid)
+            return
+        queryset = Certificate.objects.filter(pk__in=certificate_pks)
+        certificate_ids = list(queryset.values_list('certificate_id', flat=True))
+        updated = queryset.update(is_valid=is_valid)
+        # update() skips post_save, so drop cached copies explicitly
+        certificates_changed(certificate_ids)
+        self.message_user(request, f'{updated} certificates were marked as {"valid" if is_valid else "invalid"}.')
+
     def invalidate_certificates(self, request, queryset):
-        updated = queryset.update(is_valid=False)
-        self.message_user(request, f'{updated} certificates were marked as invalid.')
+        self.set_validity(request, queryset, False)
     invalidate_certificates.short_description = "Mark selected certificates as invalid"
 
     def revalidate_certificates(self, request, queryset):
-        updated = queryset.update(is_valid=True)
-        self.message_user(request, f'{updated} certificates were marked as valid.')
+        self.set_validity(request, queryset, True)
     revalidate_certificates.short_description = "Mark selected certificates as valid"
 
+    def export_certificates_zip(self, request, queryset):
+        certificate_pks = list(queryset.filter(is_valid=True).values_list('pk', flat=True))
+        if len(certificate_pks) > background_threshold():
+            queue_job(self, request, 'export_certificates', certificate_pks=certificate_pks)
+            return
+        response = StreamingHttpResponse(
+            iter_certificates_zip(queryset.filter(is_valid=True)),
+            content_type='application/zip'
+        )
+        filename = f'certificates_{timezone.now():%Y%m%d_%H%M%S}.zip'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    export_certificates_zip.short_description = "Download selected valid certificates as ZIP"
+
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
     form = StudentForm
     list_display = ('get_full_name', 'get_email', 'phone', 'require_password_change')
     search_fields = ('user__first_name', 'user__last_name', 'user__email', 'phone')
     list_filter = ('require_password_change',)
+    list_select_related = ('user',)
+    # A total order, so autocomplete pages neither repeat nor skip students
+    ordering = ('user__last_name', 'user__first_name', 'pk')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     actions = ['reset_student_password']
 
+    def get_queryset(self, request):
+        # Student.__str__ (used by certificate autocomplete) reads the user too
+        return super().get_queryset(request).select_related('user')
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_roster_view), name='certificates_student_import'),
+        ] + super().get_urls()
+
+    def import_roster_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        result = None
+        form = RosterImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['roster']
+            # Creating students hashes a password each, far too slow for a request on large cohorts
+            rows = max(sum(1 for _ in upload) - 1, 0)
+            upload.seek(0)
+            if rows > background_threshold():
+                roster = get_job_storage().save(f'rosters/{os.path.basename(upload.name)}', upload)
+                queue_job(self, request, 'import_roster', roster=roster, rows=rows)
+                return redirect('admin:certificates_student_changelist')
+            # Uploads are parsed as they are read, never loaded whole
+            roster = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            try:
+                result = import_roster(read_roster_csv(roster))
+            except (RosterError, UnicodeDecodeError) as error:
+                form.add_error('roster', str(error))
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Import roster',
+            'opts': self.model._meta,
+            'form': form,
+            'result': result,
+        }
+        return TemplateResponse(request, 'admin/certificates/student/import_roster.html', context)
+
     def get_full_name(self, obj):
         return obj.user.get_full_name()
     get_full_name.short_description = 'Name'
@@ -121,19 +235,21 @@ class StudentAdmin(admin.ModelAdmin):
     get_email.admin_order_field = 'user__email'
 
     def reset_student_password(self, request, queryset):
-        for student in queryset:
-            # Generate a new password
-            new_password = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
-            student.user.set_password(new_password)
-            student.user.save()
-            student.require_password_change = True
-            student.save()
-            self.message_user(
-                request, 
-                f"Reset password for {student.user.email}: {new_password}",
-                level='SUCCESS'
-            )
-    reset_student_password.short_description = "Reset password for selected students"
+        student_pks = list(queryset.values_list('pk', flat=True))
+        if len(student_pks) > background_threshold():
+            queue_job(self, request, 'reset_passwords', student_pks=student_pks)
+            return
+        credentials = reset_student_passwords(queryset.select_related('user'))
+        # The new passwords are handed over as a file rather than one message per student
+        response = HttpResponse(content_type='text/csv')
+        filename = f'student_passwords_{timezone.now():%Y%m%d_%H%M%S}.csv'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        writer = csv.writer(response)
+        writer.writerow(['email', 'first_name', 'last_name', 'temporary_password'])
+        for student, password in credentials:
+            writer.writerow([student.user.email, student.user.first_name, student.user.last_name, password])
+        return response
+    reset_student_password.short_description = "Reset password for selected students (downloads the new passwords)"
 
     def response_add(self, request, obj, post_url_continue=None):
         if hasattr(obj, '_temp_password'):
@@ -143,3 +259,70 @@ class StudentAdmin(admin.ModelAdmin):
                 level='SUCCESS'
             )
         return super().response_add(request, obj, post_url_continue)
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'status', 'get_progress', 'created_by', 'created_at', 'finished_at', 'get_download_link')
+    list_filter = ('status', 'kind')
+    list_select_related = ('created_by',)
+    readonly_fields = ('kind', 'arguments', 'status', 'get_progress', 'message', 'get_download_link',
+                       'created_by', 'worker', 'created_at', 'started_at', 'finished_at')
+    fields = readonly_fields
+    actions = ['requeue_jobs']
+
+    def has_add_permission(self, request):
+        # Jobs are created by admin actions
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_view), name='certificates_job_download'),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        job = Job.objects.filter(pk=pk).first()
+        if job is None or not job.result_file:
+            raise Http404
+        # Results can hold passwords: only the requester and superusers get them
+        if not self.has_view_permission(request, job) or not (
+            request.user.is_superuser or job.created_by_id == request.user.pk
+        ):
+            raise PermissionDenied
+        filename = os.path.basename(job.result_file.name)
+        if job.kind != 'reset_passwords':
+            return FileResponse(job.result_file.open('rb'), as_attachment=True, filename=filename)
+        # Temporary passwords are handed out once, then deleted
+        with job.result_file.open('rb') as result:
+            response = HttpResponse(result.read(), content_type='text/csv')
+        job.result_file.delete(save=False)
+        job.save(update_fields=['result_file'])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def get_progress(self, obj):
+        if obj.total:
+            return f'{obj.progress}/{obj.total} ({obj.progress * 100 // obj.total}%)'
+        return str(obj.progress)
+    get_progress.short_description = 'Progress'
+
+    def get_download_link(self, obj):
+        if not obj.result_file:
+            return '-'
+        return format_html('<a href="{}">Download</a>', reverse('admin:certificates_job_download', args=[obj.pk]))
+    get_download_link.short_description = 'Result'
+
+    def requeue_jobs(self, request, queryset):
+        # Failed jobs, or running ones whose worker died; a new run makes a new result
+        for job in requeueable(queryset).exclude(result_file=''):
+            job.result_file.delete(save=False)
+        updated = requeueable(queryset).update(
+            status=Job.QUEUED, progress=0, message='', worker='', started_at=None, finished_at=None, result_file=''
+        )
+        self.message_user(request, f'{updated} jobs were queued again.')
+        skipped = queryset.count() - updated
+        if skipped:
+            self.message_user(
+                request, f'{skipped} jobs were skipped: only failed or stale running jobs can be run again.',
+                level=messages.WARNING
+            )
+    requeue_jobs.short_description = "Run selected jobs again"
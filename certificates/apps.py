@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CertificatesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'certificates'
+
+    def ready(self):
+        from . import security, signals  # noqa: F401
+        from .rendering import load_certificate_template
+        try:
+            load_certificate_template()
+        except (ValueError, OSError):
+            # Loaded lazily on the first render instead
+            pass
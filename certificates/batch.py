@@ -0,0 +1,140 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.apps import apps
+from django.conf import settings
+
+# Model imports are deferred: spawned workers import this module before
+# Django is set up in them.
+
+
+def certificate_render_data(certificate):
+    """Picklable record with only the fields a render needs"""
+    user = certificate.student.user
+    return {
+        'certificate_id': certificate.certificate_id,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'email': user.email,
+        'course_name': certificate.course.name,
+        'course_duration': certificate.course.duration,
+        'start_date': certificate.start_date,
+        'end_date': certificate.end_date,
+        'grade': certificate.grade,
+        'is_valid': certificate.is_valid,
+    }
+
+
+def certificate_from_render_data(data):
+    """Rebuild an unsaved Certificate that renders like the original"""
+    from django.contrib.auth.models import User
+    from .models import Certificate, Course, Student
+
+    user = User(first_name=data['first_name'], last_name=data['last_name'], email=data['email'])
+    course = Course(name=data['course_name'], duration=data['course_duration'])
+    return Certificate(
+        student=Student(user=user),
+        course=course,
+        certificate_id=data['certificate_id'],
+        start_date=data['start_date'],
+        end_date=data['end_date'],
+        grade=data['grade'],
+        is_valid=data['is_valid'],
+    )
+
+
+def _init_worker(settings_module):
+    # Spawned workers start from a clean interpreter
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    if not apps.ready:
+        django.setup()
+
+
+def _render_chunk(records, store):
+    from .pdf_cache import store_certificate_pdf
+    from .views import generate_certificate_pdf
+
+    results = []
+    for data in records:
+        certificate = certificate_from_render_data(data)
+        try:
+            if store:
+                result = store_certificate_pdf(certificate)
+            else:
+                result = generate_certificate_pdf(certificate)
+        except Exception as exc:
+            results.append((data['certificate_id'], None, str(exc)))
+        else:
+            results.append((data['certificate_id'], result, None))
+    return results
+
+
+def _iter_certificates(certificates, batch_size=500):
+    from .models import Certificate
+
+    if hasattr(certificates, 'model'):
+        yield from certificates.select_related('student__user', 'course').iterator(chunk_size=batch_size)
+        return
+
+    def load(ids):
+        return Certificate.objects.select_related('student__user', 'course').filter(certificate_id__in=ids)
+
+    ids = []
+    for item in certificates:
+        if isinstance(item, Certificate):
+            yield item
+            continue
+        ids.append(item)
+        if len(ids) >= batch_size:
+            yield from load(ids)
+            ids = []
+    if ids:
+        yield from load(ids)
+
+
+def _iter_chunks(certificates, chunk_size):
+    chunk = []
+    for certificate in _iter_certificates(certificates):
+        chunk.append(certificate_render_data(certificate))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def render_certificates(certificates, workers=None, chunk_size=None, store=False):
+    """Render certificates across a pool of processes.
+
+    ``certificates`` is a queryset of Certificate or an iterable of
+    Certificate instances or certificate ids. Yields ``(certificate_id, result, error)`` tuples as
+    chunks complete, in no particular order. ``result`` is the PDF bytes,
+    or the render cache name when ``store`` is true; ``error`` is a
+    message when that certificate failed to render.
+    """
+    workers = workers or getattr(settings, 'CERTIFICATE_RENDER_WORKERS', None) or os.cpu_count()
+    chunk_size = chunk_size or getattr(settings, 'CERTIFICATE_RENDER_CHUNK_SIZE', 20)
+
+    chunks = _iter_chunks(certificates, chunk_size)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        # Spawned rather than forked so workers never inherit open database connections
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', ''),),
+    ) as executor:
+        pending = set()
+        while True:
+            # Keep a bounded number of chunks in flight so memory stays flat
+            while len(pending) < workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.add(executor.submit(_render_chunk, chunk, store))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
@@ -0,0 +1,199 @@
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+import django
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Certificate
+from .qr import get_qr_matrix
+from .verification import invalidate_verification_records
+from .views import generate_certificate_pdf
+
+# The suite hammers the same views from one client IP
+UNLIMITED_RATES = {scope: '1000000/s' for scope in ('verify', 'api_verify', 'view_certificate')}
+
+# Allocation tracing slows code down a lot, so it runs as a separate, shorter pass
+MAX_ALLOCATION_ITERATIONS = 20
+
+
+class Benchmark:
+    """A timed operation, with optional untimed setup before each run"""
+
+    def __init__(self, name, func, before_each=None):
+        self.name = name
+        self.func = func
+        self.before_each = before_each
+
+    def run_once(self):
+        if self.before_each:
+            self.before_each()
+        started = time.perf_counter()
+        self.func()
+        return time.perf_counter() - started
+
+
+def _get(client, url, **params):
+    def request():
+        response = client.get(url, params)
+        if response.status_code != 200:
+            raise AssertionError(f"GET {url} returned {response.status_code}")
+        # Drain streaming responses so their work is timed too
+        if response.streaming:
+            b''.join(response.streaming_content)
+    return request
+
+
+@contextmanager
+def temporary_staff_user(name):
+    """A staff account that can browse the certificate and student admin.
+
+    It has no password and no superuser rights and is deleted afterwards,
+    so runs against a real database leave no account behind.
+    """
+    user = User.objects.create_user(f'{name}-{uuid.uuid4().hex[:12]}', is_staff=True)
+    user.user_permissions.set(Permission.objects.filter(
+        content_type__app_label='certificates', codename__in=('view_certificate', 'view_student')
+    ))
+    try:
+        yield user
+    finally:
+        user.delete()
+
+
+def build_benchmarks(admin_user):
+    """Benchmarks of the hot paths, run against an already seeded database"""
+    certificate = (
+        Certificate.objects.filter(is_valid=True)
+        .select_related('student__user', 'course')
+        .order_by('pk').first()
+    )
+    if certificate is None:
+        raise ValueError("The database has no valid certificate to benchmark with.")
+    student_user = certificate.student.user
+    certificate_id = str(certificate.certificate_id)
+
+    student_client = Client()
+    student_client.force_login(student_user, backend='certificates.backends.StudentModelBackend')
+    admin_client = Client()
+    admin_client.force_login(admin_user, backend='certificates.backends.StudentModelBackend')
+    anonymous_client = Client()
+
+    def clear_qr_caches():
+        get_qr_matrix.cache_clear()
+        cache.delete(f"qr_matrix:{certificate_id}")
+
+    verify_url = reverse('certificates:verify')
+    return [
+        Benchmark('generate_certificate_pdf', lambda: generate_certificate_pdf(certificate)),
+        Benchmark('get_qr_code', certificate.get_qr_code),
+        Benchmark('get_qr_code_uncached', certificate.get_qr_code, before_each=clear_qr_caches),
+        Benchmark('verify', _get(anonymous_client, verify_url, certificate_id=certificate_id)),
+        Benchmark(
+            'verify_uncached', _get(anonymous_client, verify_url, certificate_id=certificate_id),
+            before_each=lambda: invalidate_verification_records([certificate.certificate_id]),
+        ),
+        Benchmark('verify_unknown_id', _get(anonymous_client, verify_url, certificate_id=str(uuid.UUID(int=0)))),
+        Benchmark('dashboard', _get(student_client, reverse('certificates:dashboard'))),
+        Benchmark('admin_certificate_changelist', _get(admin_client, reverse('admin:certificates_certificate_changelist'))),
+        Benchmark(
+            'admin_certificate_search',
+            _get(admin_client, reverse('admin:certificates_certificate_changelist'), q=student_user.last_name),
+        ),
+        Benchmark('admin_student_changelist', _get(admin_client, reverse('admin:certificates_student_changelist'))),
+    ]
+
+
+def percentile(sorted_values, fraction):
+    index = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+def run_benchmark(benchmark, iterations=50, warmup=5):
+    """Time a benchmark, then measure its queries and allocations per run"""
+    for _ in range(warmup):
+        benchmark.run_once()
+    timings = sorted(benchmark.run_once() for _ in range(iterations))
+
+    if benchmark.before_each:
+        benchmark.before_each()
+    queries = []
+    with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+        benchmark.func()
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(min(iterations, MAX_ALLOCATION_ITERATIONS)):
+            if benchmark.before_each:
+                benchmark.before_each()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            benchmark.func()
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    mean = statistics.fmean(timings)
+    return {
+        'name': benchmark.name,
+        'stats': {
+            'iterations': iterations,
+            'min': timings[0],
+            'max': timings[-1],
+            'mean': mean,
+            'stddev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            'median': percentile(timings, 0.5),
+            'p99': percentile(timings, 0.99),
+            'ops': 1 / mean if mean else 0.0,
+            'queries': len(queries),
+            'peak_allocated_kib': statistics.fmean(peaks) / 1024,
+        },
+    }
+
+
+def run_suite(names=None, iterations=50, warmup=5):
+    """Run the benchmarks (all, or those named) and return a JSON-serializable report"""
+    # DEBUG would log every query and slow everything down
+    with override_settings(DEBUG=False, RATE_LIMITS=UNLIMITED_RATES):
+        return _run_suite(names, iterations, warmup)
+
+
+def _run_suite(names, iterations, warmup):
+    with temporary_staff_user('benchmark') as admin_user:
+        benchmarks = build_benchmarks(admin_user)
+        if names:
+            unknown = set(names) - {benchmark.name for benchmark in benchmarks}
+            if unknown:
+                raise ValueError(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+            benchmarks = [benchmark for benchmark in benchmarks if benchmark.name in names]
+        results = [run_benchmark(benchmark, iterations, warmup) for benchmark in benchmarks]
+    return {
+        'datetime': timezone.now().isoformat(),
+        'machine_info': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'database': connection.vendor,
+        },
+        'benchmarks': results,
+    }
+
+
+def compare_reports(report, baseline):
+    """Pair each benchmark with its baseline: (name, stats, baseline stats or None)"""
+    previous = {benchmark['name']: benchmark['stats'] for benchmark in baseline['benchmarks']}
+    return [
+        (benchmark['name'], benchmark['stats'], previous.get(benchmark['name']))
+        for benchmark in report['benchmarks']
+    ]
@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class TwoTierCache(BaseCache):
+    """Small in-process LRU in front of a shared cache alias.
+
+    Reads are served locally for up to LOCAL_TIMEOUT seconds before going
+    back to the shared cache; writes go through to the shared cache and
+    update the local copy. Other processes may therefore see a changed
+    value up to LOCAL_TIMEOUT seconds late, so only use it for hot,
+    read-mostly keys.
+
+    OPTIONS:
+        SHARED: alias of the shared cache (default 'default')
+        LOCAL_TIMEOUT: seconds a value is served from process memory (default 5)
+        LOCAL_MAX_ENTRIES: size of the in-process LRU (default 1000)
+    """
+
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        super().__init__(params)
+        self._shared_alias = options.get('SHARED', 'default')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._local_max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return False, None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._local[key]
+                return False, None
+            self._local.move_to_end(key)
+            return True, value
+
+    def _local_set(self, key, value):
+        with self._lock:
+            self._local[key] = (value, time.monotonic() + self._local_timeout)
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    def _local_key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        found, value = self._local_get(local_key)
+        if found:
+            return value
+        value = self.shared.get(key, self._missing_key, version=version)
+        if value is self._missing_key:
+            return default
+        self._local_set(local_key, value)
+        return value
+
+    def _local_get_many(self, keys, version):
+        """Split keys into the local hits and the keys still to fetch"""
+        result = {}
+        remaining = []
+        for key in keys:
+            found, value = self._local_get(self._local_key(key, version))
+            if found:
+                result[key] = value
+            else:
+                remaining.append(key)
+        return result, remaining
+
+    def get_many(self, keys, version=None):
+        result, remaining = self._local_get_many(keys, version)
+        if remaining:
+            fetched = self.shared.get_many(remaining, version=version)
+            for key, value in fetched.items():
+                self._local_set(self._local_key(key, version), value)
+            result.update(fetched)
+        return result
+
+    async def aget_many(self, keys, version=None):
+        # Local hits are answered on the event loop; only misses go to the shared cache
+        result, remaining = self._local_get_many(keys, version)
+        if remaining:
+            fetched = await self.shared.aget_many(remaining, version=version)
+            for key, value in fetched.items():
+                self._local_set(self._local_key(key, version), value)
+            result.update(fetched)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._local_set(self._local_key(key, version), value)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(self._local_key(key, version), value)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.add(key, value, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.incr(key, delta, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def has_key(self, key, version=None):
+        found, _ = self._local_get(self._local_key(key, version))
+        return found or self.shared.has_key(key, version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self._local_delete(*(self._local_key(key, version) for key in keys))
+        self.shared.delete_many(keys, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def clear_local(self):
+        """Forget the in-process copies only"""
+        with self._lock:
+            self._local.clear()
@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+from .batch import _init_worker
+
+# Below this many passwords, starting worker processes costs more than it saves
+PARALLEL_HASH_MIN = 8
+
+
+def _hash_chunk(passwords):
+    return [make_password(password) for password in passwords]
+
+
+class PasswordHasherPool:
+    """Hash passwords across worker processes.
+
+    Each hash is a deliberately slow PBKDF2 run, so bulk operations spread
+    them over one process per CPU. The pool starts on the first batch
+    large enough to need it and is reused until close(); use it as a
+    context manager to share it between batches.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count()
+        self._executor = None
+
+    def hash(self, passwords):
+        """Return make_password() of each password, in order"""
+        passwords = list(passwords)
+        if self.workers <= 1 or len(passwords) < PARALLEL_HASH_MIN:
+            return _hash_chunk(passwords)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', ''),),
+            )
+        size = -(-len(passwords) // self.workers)
+        chunks = [passwords[start:start + size] for start in range(0, len(passwords), size)]
+        return [hashed for chunk in self._executor.map(_hash_chunk, chunks) for hashed in chunk]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def make_passwords(passwords, workers=None):
+    """make_password() for many passwords at once"""
+    with PasswordHasherPool(workers) as pool:
+        return pool.hash(passwords)
+
+
+def reset_student_passwords(students, workers=None, hasher=None):
+    """Give students new temporary passwords and require a change on next login.
+
+    Passwords are hashed in parallel, through hasher when given, and
+    written with two bulk updates. Returns (student, temporary password)
+    pairs.
+    """
+    from django.contrib.auth.models import User
+    from .models import Student
+
+    students = list(students)
+    passwords = [Student.generate_temp_password() for _ in students]
+    hashes = hasher.hash(passwords) if hasher else make_passwords(passwords, workers)
+    for student, hashed in zip(students, hashes):
+        student.user.password = hashed
+        student.require_password_change = True
+    User.objects.bulk_update([student.user for student in students], ['password'], batch_size=500)
+    Student.objects.bulk_update(students, ['require_password_change'], batch_size=500)
+    return list(zip(students, passwords))
@@ -0,0 +1,244 @@
+import csv
+import io
+import logging
+import time
+import traceback
+from datetime import timedelta
+from tempfile import TemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .credentials import PasswordHasherPool, reset_student_passwords
+from .export import iter_certificates_zip
+from .models import Certificate, Job, Student, get_job_storage
+from .roster import import_roster, read_roster_csv
+from .search import refresh_search_documents
+from .signals import certificates_changed
+
+logger = logging.getLogger(__name__)
+
+# Progress is written at most this often, so tiny steps don't hammer the jobs table
+PROGRESS_INTERVAL = 1.0
+
+# kind -> (label, handler); see job_handler
+_handlers = {}
+
+
+def job_handler(kind, label):
+    """Register a function as the handler of a job kind.
+
+    The handler is called as handler(job, progress) in the worker process
+    and may return a short summary for the job's message. Calling
+    progress(done, total) records how far it got.
+    """
+    def decorator(func):
+        _handlers[kind] = (label, func)
+        return func
+    return decorator
+
+
+def get_job_label(kind):
+    return _handlers.get(kind, (kind, None))[0]
+
+
+def background_threshold():
+    """Admin actions on more objects than this are queued as jobs"""
+    return getattr(settings, 'JOB_BACKGROUND_THRESHOLD', 200)
+
+
+def requeueable(queryset):
+    """Narrow jobs to those safe to run again.
+
+    Failed jobs always are. Running ones only once they have been running
+    longer than JOB_STALE_AFTER seconds, as their worker has then most
+    likely died; a live worker would otherwise end up racing a second one.
+    """
+    started_before = timezone.now() - timedelta(seconds=getattr(settings, 'JOB_STALE_AFTER', 60 * 60 * 6))
+    return queryset.filter(Q(status=Job.FAILED) | Q(status=Job.RUNNING, started_at__lt=started_before))
+
+
+def expire_job_results():
+    """Delete result files of jobs that finished over JOB_RESULT_TTL seconds ago.
+
+    Results can hold temporary passwords, so they aren't kept around
+    forever; run_worker calls this periodically. Returns how many files
+    were deleted.
+    """
+    finished_before = timezone.now() - timedelta(seconds=getattr(settings, 'JOB_RESULT_TTL', 60 * 60 * 24))
+    expired = Job.objects.filter(finished_at__lt=finished_before).exclude(result_file='')
+    count = 0
+    for job in expired:
+        job.result_file.delete(save=False)
+        job.save(update_fields=['result_file'])
+        count += 1
+    return count
+
+
+def enqueue_job(kind, created_by=None, **arguments):
+    """Queue a job for run_worker; arguments must be JSON serializable"""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(kind=kind, arguments=arguments, created_by=created_by)
+
+
+def claim_job(worker_name):
+    """Mark the oldest queued job as running by this worker and return it.
+
+    Returns None when the queue is empty. Safe to call from any number of
+    workers at once: each job is claimed by exactly one of them.
+    """
+    queued = Job.objects.filter(status=Job.QUEUED).order_by('created_at', 'pk')
+    now = timezone.now()
+    if connections[queued.db].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=queued.db):
+            job = queued.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            job.status, job.worker, job.started_at = Job.RUNNING, worker_name, now
+            job.save(update_fields=['status', 'worker', 'started_at'])
+            return job
+
+    # No row locks to skip (SQLite): claim with a conditional update, which
+    # only one of several workers racing for the same job can win
+    while True:
+        job = queued.first()
+        if job is None:
+            return None
+        claimed = Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker_name, started_at=now
+        )
+        if claimed:
+            job.status, job.worker, job.started_at = Job.RUNNING, worker_name, now
+            return job
+
+
+def _progress_reporter(job):
+    last_write = 0
+
+    def progress(done, total=None):
+        nonlocal last_write
+        job.progress = done
+        if total is not None:
+            job.total = total
+        if time.monotonic() - last_write >= PROGRESS_INTERVAL or done == job.total:
+            Job.objects.filter(pk=job.pk).update(progress=job.progress, total=job.total)
+            last_write = time.monotonic()
+    return progress
+
+
+def run_job(job):
+    """Run a claimed job to completion, recording its outcome"""
+    _, handler = _handlers.get(job.kind, (None, None))
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        job.message = handler(job, _progress_reporter(job)) or ''
+        job.status = Job.DONE
+    except Exception:
+        logger.exception("Job %s failed", job.pk)
+        job.message = traceback.format_exc()
+        job.status = Job.FAILED
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'message', 'progress', 'total', 'result_file', 'finished_at'])
+    return job
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@job_handler('export_certificates', 'Certificate export')
+def export_certificates_job(job, progress):
+    queryset = Certificate.objects.filter(pk__in=job.arguments['certificate_pks'], is_valid=True)
+    total = queryset.count()
+    progress(0, total)
+    with TemporaryFile() as archive:
+        # One piece per certificate, then the archive's central directory
+        for done, data in enumerate(iter_certificates_zip(queryset), 1):
+            archive.write(data)
+            progress(min(done, total))
+        archive.seek(0)
+        job.result_file.save(f'certificates_{job.pk}.zip', File(archive), save=False)
+    return f"Exported {total} certificates."
+
+
+@job_handler('reset_passwords', 'Password reset')
+def reset_passwords_job(job, progress):
+    student_pks = job.arguments['student_pks']
+    progress(0, len(student_pks))
+    done = 0
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['email', 'first_name', 'last_name', 'temporary_password'])
+    with PasswordHasherPool() as hasher:
+        for batch in _batches(student_pks, 500):
+            students = Student.objects.filter(pk__in=batch).select_related('user')
+            for student, password in reset_student_passwords(students, hasher=hasher):
+                writer.writerow([student.user.email, student.user.first_name, student.user.last_name, password])
+            done += len(batch)
+            progress(done)
+    job.result_file.save(f'student_passwords_{job.pk}.csv', ContentFile(output.getvalue().encode('utf-8')), save=False)
+    return f"Reset {len(student_pks)} passwords."
+
+
+@job_handler('import_roster', 'Roster import')
+def import_roster_job(job, progress):
+    """Import a roster uploaded through the admin and saved to job storage"""
+    storage = get_job_storage()
+    errors = io.StringIO()
+    writer = csv.writer(errors)
+    writer.writerow(['line', 'problem'])
+    progress(0, job.arguments.get('rows'))
+    with storage.open(job.arguments['roster'], 'rb') as upload:
+        roster = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+        result = import_roster(
+            read_roster_csv(roster),
+            on_error=lambda line, message: writer.writerow([line, message]),
+            on_chunk=lambda result: progress(result.rows),
+        )
+    # The upload holds personal data and is not needed once imported
+    storage.delete(job.arguments['roster'])
+    if result.errors:
+        job.result_file.save(f'roster_errors_{job.pk}.csv', ContentFile(errors.getvalue().encode('utf-8')), save=False)
+    return (
+        f"Imported {result.students_created} student(s) and {result.certificates_created} certificate(s) "
+        f"from {result.rows} row(s), {result.errors} row(s) skipped."
+    )
+
+
+@job_handler('refresh_certificates', 'Certificate refresh')
+def refresh_certificates_job(job, progress):
+    """Catch certificates up with a renamed student or course; see signals.refresh_certificates"""
+    certificate_pks = job.arguments['certificate_pks']
+    progress(0, len(certificate_pks))
+    done = 0
+    for batch in _batches(certificate_pks, 1000):
+        queryset = Certificate.objects.filter(pk__in=batch)
+        refresh_search_documents(queryset)
+        certificates_changed(queryset.values_list('certificate_id', flat=True))
+        done += len(batch)
+        progress(done)
+    return f"Refreshed {len(certificate_pks)} certificates."
+
+
+@job_handler('set_certificate_validity', 'Certificate validity update')
+def set_certificate_validity_job(job, progress):
+    certificate_pks = job.arguments['certificate_pks']
+    is_valid = job.arguments['is_valid']
+    progress(0, len(certificate_pks))
+    done = updated = 0
+    for batch in _batches(certificate_pks, 1000):
+        queryset = Certificate.objects.filter(pk__in=batch)
+        certificate_ids = list(queryset.values_list('certificate_id', flat=True))
+        updated += queryset.update(is_valid=is_valid)
+        # update() skips post_save, so drop cached copies explicitly
+        certificates_changed(certificate_ids)
+        done += len(batch)
+        progress(done)
+    return f"{updated} certificates were marked as {'valid' if is_valid else 'invalid'}."
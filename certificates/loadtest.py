@@ -0,0 +1,307 @@
+import http.cookiejar
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from .benchmarks import percentile, temporary_staff_user
+from .models import Certificate, Student
+
+# Scenario weights of the built-in traffic mixes
+MIXES = {
+    # Ceremony day: QR scans dominate, graduates download, staff look people up
+    'graduation': {'verify': 60, 'pdf': 15, 'dashboard': 10, 'api_verify_batch': 5, 'verify_unknown': 5, 'admin_search': 5},
+    'qr-burst': {'verify': 95, 'verify_unknown': 5},
+    'downloads': {'pdf': 80, 'dashboard': 20},
+    'admin': {'admin_search': 80, 'admin_changelist': 20},
+}
+
+API_BATCH_SIZE = 20
+
+
+def parse_mix(mix):
+    """A built-in mix name, or weights like 'verify=70,pdf=30'"""
+    if mix in MIXES:
+        return MIXES[mix]
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {name.strip()} (choose from {', '.join(SCENARIOS)})")
+        try:
+            weights[name.strip()] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid weight in mix: {part}")
+    return weights
+
+
+class LoadTestData:
+    """Ids, students and search terms the scenarios draw from"""
+
+    def __init__(self, sample_size=1000, students=50):
+        self.certificate_ids = [
+            str(certificate_id) for certificate_id in
+            Certificate.objects.filter(is_valid=True).values_list('certificate_id', flat=True)[:sample_size]
+        ]
+        if not self.certificate_ids:
+            raise ValueError("The database has no valid certificates; run manage.py seed_certifier first.")
+        self.students = []
+        for student in Student.objects.filter(
+            require_password_change=False, certificate__is_valid=True
+        ).select_related('user').distinct()[:students]:
+            certificate_ids = [
+                str(certificate_id) for certificate_id in
+                student.certificate_set.filter(is_valid=True).values_list('certificate_id', flat=True)
+            ]
+            self.students.append((student.user, certificate_ids))
+        self.search_terms = list(
+            User.objects.filter(student__isnull=False).values_list('last_name', flat=True).distinct()[:100]
+        ) or ['a']
+
+
+class ClientSession:
+    """Requests through the Django test client, in this process"""
+
+    def __init__(self, user=None):
+        self.client = Client()
+        if user is not None:
+            self.client.force_login(user, backend='certificates.backends.StudentModelBackend')
+
+    def request(self, method, path, params=None, body=None):
+        if method == 'POST':
+            response = self.client.post(path, json.dumps(body), content_type='application/json')
+        else:
+            response = self.client.get(path, params)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response.status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """Requests over HTTP to a running server, e.g. gunicorn"""
+
+    def __init__(self, base_url, username=None, password=None, login_path=None):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+        if username is not None:
+            self.login(login_path, username, password)
+
+    def login(self, login_path, username, password):
+        self.request('GET', login_path)
+        token = next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+        status = self.request('POST', login_path, form={
+            'username': username, 'password': password, 'csrfmiddlewaretoken': token,
+        })
+        if status != 302:
+            raise ValueError(f"Logging in as {username} failed with status {status}")
+
+    def request(self, method, path, params=None, body=None, form=None):
+        url = self.base_url + path
+        if params:
+            url += '?' + urllib.parse.urlencode(params)
+        headers = {'Referer': self.base_url + path}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode('utf-8')
+        try:
+            with self.opener.open(urllib.request.Request(url, data=data, headers=headers, method=method)) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code
+
+
+def _verify(session, data, rng, state):
+    return session.request('GET', reverse('certificates:verify'), {'certificate_id': rng.choice(data.certificate_ids)})
+
+
+def _verify_unknown(session, data, rng, state):
+    return session.request('GET', reverse('certificates:verify'), {'certificate_id': str(uuid.UUID(int=rng.getrandbits(128)))})
+
+
+def _api_verify_batch(session, data, rng, state):
+    certificate_ids = rng.sample(data.certificate_ids, min(API_BATCH_SIZE, len(data.certificate_ids)))
+    return session.request('POST', reverse('certificates:api_verify'), body={'certificate_ids': certificate_ids})
+
+
+def _pdf(session, data, rng, state):
+    return session.request('GET', reverse('certificates:view_certificate', args=[rng.choice(state['certificate_ids'])]))
+
+
+def _dashboard(session, data, rng, state):
+    return session.request('GET', reverse('certificates:dashboard'))
+
+
+def _admin_search(session, data, rng, state):
+    return session.request('GET', reverse('admin:certificates_certificate_changelist'), {'q': rng.choice(data.search_terms)})
+
+
+def _admin_changelist(session, data, rng, state):
+    return session.request('GET', reverse('admin:certificates_certificate_changelist'))
+
+
+# name -> (role of the session it needs, request function)
+SCENARIOS = {
+    'verify': ('anonymous', _verify),
+    'verify_unknown': ('anonymous', _verify_unknown),
+    'api_verify_batch': ('anonymous', _api_verify_batch),
+    'pdf': ('student', _pdf),
+    'dashboard': ('student', _dashboard),
+    'admin_search': ('admin', _admin_search),
+    'admin_changelist': ('admin', _admin_changelist),
+}
+
+
+class LoadTest:
+    """Replay a weighted mix of scenarios from concurrent threads.
+
+    Without base_url, requests go through the test client in this
+    process; otherwise over HTTP to that server. Students sign in with
+    student_password over HTTP, admins with admin_credentials.
+    """
+
+    def __init__(self, mix, data, concurrency=10, duration=30, max_requests=None, rate=None,
+                 base_url=None, student_password='password', admin_credentials=None, seed=0):
+        self.mix = mix
+        self.data = data
+        self.concurrency = concurrency
+        self.duration = duration
+        self.max_requests = max_requests
+        self.rate = rate
+        self.base_url = base_url
+        self.student_password = student_password
+        self.admin_credentials = admin_credentials
+        self.seed = seed
+        self.issued = 0
+        self.lock = threading.Lock()
+        self.results = []
+        self.errors = []
+        self.admin_user = None
+
+    def make_session(self, role, thread_number):
+        if role == 'anonymous':
+            return ClientSession() if self.base_url is None else HttpSession(self.base_url)
+        if role == 'student':
+            if not self.data.students:
+                raise ValueError("No student with a valid certificate to sign in as.")
+            user, _ = self.data.students[thread_number % len(self.data.students)]
+            if self.base_url is None:
+                return ClientSession(user)
+            return HttpSession(self.base_url, user.username, self.student_password, reverse('login'))
+        if self.base_url is None:
+            return ClientSession(self.admin_user)
+        if not self.admin_credentials:
+            raise ValueError("Admin scenarios over HTTP need --admin-username and --admin-password.")
+        return HttpSession(self.base_url, *self.admin_credentials, reverse('admin:login'))
+
+    def next_request_allowed(self):
+        with self.lock:
+            if self.max_requests is not None and self.issued >= self.max_requests:
+                return False
+            self.issued += 1
+            return True
+
+    def worker(self, thread_number, sessions, deadline):
+        rng = random.Random(self.seed * 1000 + thread_number)
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        state = {}
+        if self.data.students:
+            state['certificate_ids'] = self.data.students[thread_number % len(self.data.students)][1]
+        results = []
+        # Each thread paces itself to its share of the target rate
+        interval = self.concurrency / self.rate if self.rate else 0
+        next_start = time.monotonic()
+        try:
+            while time.monotonic() < deadline and self.next_request_allowed():
+                if interval:
+                    delay = next_start - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_start += interval
+                name = rng.choices(names, weights)[0]
+                role, scenario = SCENARIOS[name]
+                started = time.perf_counter()
+                status = scenario(sessions[role], self.data, rng, state)
+                results.append((name, status, time.perf_counter() - started))
+        except Exception as error:
+            with self.lock:
+                self.errors.append(f"thread {thread_number}: {error!r}")
+        finally:
+            with self.lock:
+                self.results.extend(results)
+            if self.base_url is None:
+                connections.close_all()
+
+    def run(self):
+        # Sign every thread in up front, so logins are neither timed nor concurrent
+        roles = {SCENARIOS[name][0] for name in self.mix}
+        # In process, admin scenarios use a throwaway staff account
+        needs_admin = 'admin' in roles and self.base_url is None
+        with temporary_staff_user('loadtest') if needs_admin else nullcontext() as self.admin_user:
+            sessions = [
+                {role: self.make_session(role, number) for role in roles}
+                for number in range(self.concurrency)
+            ]
+            started = time.monotonic()
+            deadline = started + self.duration
+            threads = [
+                threading.Thread(target=self.worker, args=(number, sessions[number], deadline), daemon=True)
+                for number in range(self.concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return summarize(self.results, time.monotonic() - started, self.errors)
+
+
+def summarize(results, elapsed, errors=()):
+    """Per-scenario throughput and latency percentiles, in milliseconds"""
+    by_scenario = defaultdict(list)
+    statuses = defaultdict(Counter)
+    for name, status, latency in results:
+        by_scenario[name].append(latency)
+        statuses[name][status] += 1
+    scenarios = {}
+    for name, latencies in sorted(by_scenario.items()):
+        latencies.sort()
+        failed = sum(count for status, count in statuses[name].items() if status >= 400)
+        scenarios[name] = {
+            'requests': len(latencies),
+            'failed': failed,
+            'rps': len(latencies) / elapsed,
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000,
+            'statuses': {str(status): count for status, count in sorted(statuses[name].items())},
+        }
+    return {
+        'elapsed': elapsed,
+        'requests': len(results),
+        'rps': len(results) / elapsed if elapsed else 0.0,
+        'scenarios': scenarios,
+        'errors': list(errors),
+    }
@@ -0,0 +1,127 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from certificates.benchmarks import compare_reports, run_suite
+from certificates.seeding import seed_dataset
+
+COLUMNS = (
+    # header, stats key, scale, format
+    ('Min', 'min', 1000, '{:.3f}'),
+    ('Max', 'max', 1000, '{:.3f}'),
+    ('Mean', 'mean', 1000, '{:.3f}'),
+    ('StdDev', 'stddev', 1000, '{:.3f}'),
+    ('Median', 'median', 1000, '{:.3f}'),
+    ('P99', 'p99', 1000, '{:.3f}'),
+    ('OPS', 'ops', 1, '{:.1f}'),
+    ('Queries', 'queries', 1, '{}'),
+    ('Peak KiB', 'peak_allocated_kib', 1, '{:.1f}'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks PDF rendering, QR codes, verification, the dashboard and the admin changelists. '
+        'By default runs against a throwaway test database seeded with synthetic data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', action='append', dest='names', metavar='NAME',
+                            help='Only run this benchmark (repeatable)')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed runs per benchmark')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed runs before timing')
+        parser.add_argument('--students', type=int, default=500, help='Students to seed')
+        parser.add_argument('--courses', type=int, default=10, help='Courses to seed')
+        parser.add_argument('--certs-per-student', type=int, default=3, help='Certificates per seeded student')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic data')
+        parser.add_argument('--existing-db', action='store_true',
+                            help='Benchmark the configured database as it is instead of a seeded test database')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', metavar='BASELINE', help='Compare with results saved by --output')
+        parser.add_argument('--fail-threshold', type=float, metavar='PERCENT',
+                            help='With --compare, fail if a median gets this much slower or queries increase')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as baseline_file:
+                    baseline = json.load(baseline_file)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Cannot read baseline: {error}")
+
+        try:
+            if options['existing_db']:
+                report = run_suite(options['names'], options['iterations'], options['warmup'])
+            else:
+                report = self.run_seeded(options)
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Results saved to {options['output']}")
+        if baseline is not None:
+            regressions = self.print_comparison(report, baseline, options['fail_threshold'])
+            if regressions:
+                raise CommandError(f"Regression in {', '.join(regressions)}")
+
+    def run_seeded(self, options):
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(
+                f"Seeding {options['students']} students, {options['courses']} courses, "
+                f"{options['certs_per_student']} certificates each..."
+            )
+            seed_dataset(options['students'], options['courses'], options['certs_per_student'], options['seed'])
+            report = run_suite(options['names'], options['iterations'], options['warmup'])
+            report['dataset'] = {
+                key: options[key] for key in ('students', 'courses', 'certs_per_student', 'seed')
+            }
+            return report
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def print_report(self, report):
+        rows = [['Name (time in ms)'] + [header for header, *_ in COLUMNS]]
+        for benchmark in report['benchmarks']:
+            stats = benchmark['stats']
+            rows.append([benchmark['name']] + [
+                template.format(stats[key] * scale) for _, key, scale, template in COLUMNS
+            ])
+        widths = [max(len(row[index]) for row in rows) for index in range(len(rows[0]))]
+        for number, row in enumerate(rows):
+            self.stdout.write('  '.join(
+                cell.ljust(width) if index == 0 else cell.rjust(width)
+                for index, (cell, width) in enumerate(zip(row, widths))
+            ))
+            if number == 0:
+                self.stdout.write('-' * (sum(widths) + 2 * (len(widths) - 1)))
+
+    def print_comparison(self, report, baseline, threshold):
+        """Print median and query changes; return the names of regressed benchmarks"""
+        self.stdout.write('\nCompared with baseline from ' + baseline.get('datetime', 'unknown date'))
+        regressions = []
+        for name, stats, previous in compare_reports(report, baseline):
+            if previous is None:
+                self.stdout.write(f"  {name}: no baseline")
+                continue
+            change = (stats['median'] / previous['median'] - 1) * 100 if previous['median'] else 0.0
+            line = (
+                f"  {name}: median {previous['median'] * 1000:.3f} -> {stats['median'] * 1000:.3f} ms "
+                f"({change:+.1f}%), queries {previous['queries']} -> {stats['queries']}"
+            )
+            regressed = threshold is not None and (change > threshold or stats['queries'] > previous['queries'])
+            if regressed:
+                regressions.append(name)
+                line = self.style.ERROR(line)
+            elif change < 0:
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
+        return regressions
@@ -0,0 +1,54 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+from certificates.models import Certificate, Course, Student
+
+
+class Command(BaseCommand):
+    help = (
+        'Prints the query plan and timing of the main Certificate access patterns. '
+        'Run it on a seeded database before and after migrating indexes to compare.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Timed executions per query')
+        parser.add_argument('--search', default='smith', help='Term used for the admin search query')
+
+    def handle(self, *args, **options):
+        student = Student.objects.order_by('?').first()
+        course = Course.objects.order_by('?').first()
+        if student is None or course is None:
+            raise CommandError('The database has no students or courses; seed it first.')
+
+        term = options['search']
+        queries = {
+            'dashboard (student, -issue_date)': Certificate.objects.filter(student=student)
+                .order_by('-issue_date', '-pk')[:20],
+            'admin filter (course, is_valid)': Certificate.objects.filter(course=course, is_valid=True)
+                .order_by('-pk')[:100],
+            'admin filter (issue_date)': Certificate.objects.filter(
+                issue_date__gte=timezone.now() - timedelta(days=7)
+            ).order_by('-issue_date')[:100],
+            'admin search (icontains)': Certificate.objects.filter(
+                Q(certificate_id__icontains=term) | Q(student__user__email__icontains=term)
+                | Q(student__user__first_name__icontains=term) | Q(student__user__last_name__icontains=term)
+                | Q(course__name__icontains=term) | Q(grade__icontains=term)
+            )[:100],
+        }
+
+        for label, queryset in queries.items():
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(queryset.explain())
+            self.stdout.write(
+                f"median {statistics.median(timings):.2f} ms, "
+                f"max {max(timings):.2f} ms over {options['repeat']} runs\n"
+            )
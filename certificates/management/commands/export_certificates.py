@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from certificates.models import Certificate, Course
+from certificates.export import iter_certificates_zip
+
+
+class Command(BaseCommand):
+    help = 'Exports certificate PDFs to a ZIP archive, rendering them one at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path of the ZIP file to write')
+        parser.add_argument('--course', type=int, action='append', dest='courses',
+                            help='Only export certificates of this course id (repeatable)')
+        parser.add_argument('--include-invalid', action='store_true',
+                            help='Also export certificates marked as invalid')
+
+    def handle(self, *args, **options):
+        queryset = Certificate.objects.all()
+        if options['courses']:
+            missing = set(options['courses']) - set(
+                Course.objects.filter(pk__in=options['courses']).values_list('pk', flat=True)
+            )
+            if missing:
+                raise CommandError(f"Unknown course id(s): {', '.join(map(str, sorted(missing)))}")
+            queryset = queryset.filter(course__in=options['courses'])
+        if not options['include_invalid']:
+            queryset = queryset.filter(is_valid=True)
+
+        total = queryset.count()
+        with open(options['output'], 'wb') as output:
+            for chunk in iter_certificates_zip(queryset):
+                output.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Exported {total} certificates to {options['output']}"))
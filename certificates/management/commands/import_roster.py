@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from certificates.roster import DEFAULT_CHUNK_SIZE, RosterError, import_roster, read_roster_csv
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports students, and certificates for rows with a course, from a CSV roster '
+        '(columns: email, first_name, last_name, phone, course, grade, start_date, end_date). '
+        'Invalid rows are reported and skipped; the rest are imported.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('roster', help='Path of the CSV file to import')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Rows validated and saved per transaction')
+
+    def handle(self, *args, **options):
+        def report(line, message):
+            self.stderr.write(f"Line {line}: {message}")
+
+        try:
+            with open(options['roster'], newline='', encoding='utf-8-sig') as roster:
+                result = import_roster(read_roster_csv(roster), options['chunk_size'], on_error=report)
+        except (OSError, RosterError) as error:
+            raise CommandError(str(error))
+
+        style = self.style.WARNING if result.errors else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Imported {result.students_created} student(s) and {result.certificates_created} "
+            f"certificate(s) from {result.rows} row(s), {result.errors} row(s) skipped"
+        ))
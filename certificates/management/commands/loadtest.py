@@ -0,0 +1,167 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from certificates.loadtest import MIXES, SCENARIOS, LoadTest, LoadTestData, parse_mix
+from certificates.seeding import seed_dataset
+
+STARTUP_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays a traffic mix against the app from concurrent threads and reports throughput and '
+        'tail latency per scenario. By default requests go through the test client against a seeded '
+        f"test database; --url or --gunicorn send real HTTP instead. Mixes: {', '.join(MIXES)}; "
+        f"scenarios: {', '.join(SCENARIOS)}."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mix', default='graduation',
+                            help="Built-in mix name or weights such as 'verify=70,pdf=30'")
+        parser.add_argument('--concurrency', type=int, default=10, help='Concurrent client threads')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+        parser.add_argument('--requests', type=int, help='Stop after this many requests')
+        parser.add_argument('--rate', type=float, help='Target requests per second across all threads')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for data and traffic')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument('--existing-db', action='store_true',
+                            help='Use the configured database through the test client instead of seeding')
+        target.add_argument('--url', help='Base URL of a running server using the configured database')
+        target.add_argument('--gunicorn', type=int, metavar='WORKERS',
+                            help='Start gunicorn with this many workers on the configured database and test it')
+
+        parser.add_argument('--students', type=int, default=500, help='Students to seed')
+        parser.add_argument('--courses', type=int, default=10, help='Courses to seed')
+        parser.add_argument('--certs-per-student', type=int, default=3, help='Certificates per seeded student')
+        parser.add_argument('--student-password', default='password', help='Password of the students (HTTP only)')
+        parser.add_argument('--admin-username', help='Admin to sign in as for admin scenarios (HTTP only)')
+        parser.add_argument('--admin-password', help='Password of --admin-username')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+            if options['gunicorn']:
+                with self.gunicorn(options['gunicorn']) as base_url:
+                    summary = self.run_load_test(mix, options, base_url)
+            elif options['url']:
+                summary = self.run_load_test(mix, options, options['url'])
+            elif options['existing_db']:
+                with override_settings(RATE_LIMITS_ENABLED=False):
+                    summary = self.run_load_test(mix, options)
+            else:
+                summary = self.run_seeded(mix, options)
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        self.print_summary(summary)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(summary, output, indent=2)
+            self.stdout.write(f"Results saved to {options['output']}")
+
+    def run_load_test(self, mix, options, base_url=None):
+        data = LoadTestData(students=options['concurrency'])
+        admin_credentials = None
+        if options['admin_username']:
+            admin_credentials = (options['admin_username'], options['admin_password'] or '')
+        load_test = LoadTest(
+            mix, data,
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+            max_requests=options['requests'],
+            rate=options['rate'],
+            base_url=base_url,
+            student_password=options['student_password'],
+            admin_credentials=admin_credentials,
+            seed=options['seed'],
+        )
+        self.stdout.write(
+            f"Running {options['mix']} with {options['concurrency']} threads against {base_url or 'the test client'}..."
+        )
+        return load_test.run()
+
+    def run_seeded(self, mix, options):
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(
+                f"Seeding {options['students']} students, {options['courses']} courses, "
+                f"{options['certs_per_student']} certificates each..."
+            )
+            seed_dataset(options['students'], options['courses'], options['certs_per_student'], options['seed'])
+            with tempfile.TemporaryDirectory() as pdf_dir, override_settings(
+                RATE_LIMITS_ENABLED=False,
+                CERTIFICATE_PDF_CACHE_STORAGE='django.core.files.storage.FileSystemStorage',
+                CERTIFICATE_PDF_CACHE_OPTIONS={'location': pdf_dir},
+            ):
+                return self.run_load_test(mix, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    @contextmanager
+    def gunicorn(self, workers):
+        """Serve the configured database with gunicorn on a free local port"""
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        # Every simulated client comes from the same IP
+        env = {**os.environ, 'RATE_LIMITS_ENABLED': 'False'}
+        process = subprocess.Popen([
+            sys.executable, '-m', 'gunicorn', 'certifier.wsgi:application',
+            '--workers', str(workers), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+        ], env=env)
+        try:
+            deadline = time.monotonic() + STARTUP_TIMEOUT
+            while True:
+                if process.poll() is not None:
+                    raise ValueError("gunicorn exited during startup.")
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise ValueError(f"gunicorn did not start listening within {STARTUP_TIMEOUT} seconds.")
+                    time.sleep(0.2)
+            self.stdout.write(f"Started gunicorn with {workers} workers on port {port}")
+            yield f'http://127.0.0.1:{port}'
+        finally:
+            process.terminate()
+            process.wait(timeout=STARTUP_TIMEOUT)
+
+    def print_summary(self, summary):
+        header = ('Scenario', 'Requests', 'Failed', 'RPS', 'p50 ms', 'p95 ms', 'p99 ms', 'Max ms')
+        rows = [header]
+        for name, stats in summary['scenarios'].items():
+            rows.append((
+                name, str(stats['requests']), str(stats['failed']), f"{stats['rps']:.1f}",
+                f"{stats['p50_ms']:.1f}", f"{stats['p95_ms']:.1f}", f"{stats['p99_ms']:.1f}", f"{stats['max_ms']:.1f}",
+            ))
+        widths = [max(len(row[index]) for row in rows) for index in range(len(header))]
+        for number, row in enumerate(rows):
+            self.stdout.write('  '.join(
+                cell.ljust(width) if index == 0 else cell.rjust(width)
+                for index, (cell, width) in enumerate(zip(row, widths))
+            ))
+            if number == 0:
+                self.stdout.write('-' * (sum(widths) + 2 * (len(widths) - 1)))
+        self.stdout.write(
+            f"\n{summary['requests']} requests in {summary['elapsed']:.1f}s ({summary['rps']:.1f}/s)"
+        )
+        for name, stats in summary['scenarios'].items():
+            if stats['failed']:
+                self.stdout.write(self.style.WARNING(f"{name} status codes: {stats['statuses']}"))
+        for error in summary['errors']:
+            self.stdout.write(self.style.ERROR(error))
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+from certificates.batch import render_certificates
+from certificates.models import Certificate
+from certificates.pdf_cache import get_pdf_storage, pdf_cache_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Renders and stores PDFs for valid certificates whose cached render is missing or stale. '
+        'Already stored renders are skipped, so an interrupted run resumes where it stopped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only certificates issued on or after this date/datetime (ISO 8601)')
+        parser.add_argument('--workers', type=int, help='Number of render processes (default: one per CPU)')
+        parser.add_argument('--chunk-size', type=int, help='Certificates sent to a worker at a time')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many renders are stale')
+        parser.add_argument('--progress-every', type=int, default=100, help='Print progress every N certificates')
+
+    def handle(self, *args, **options):
+        queryset = Certificate.objects.filter(is_valid=True).order_by('pk')
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                since_date = parse_date(options['since'])
+                if since_date is None:
+                    raise CommandError(f"Invalid --since value: {options['since']}")
+                since = timezone.datetime.combine(since_date, timezone.datetime.min.time())
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            queryset = queryset.filter(issue_date__gte=since)
+
+        stale = self.find_stale(queryset)
+        self.stdout.write(f"{len(stale)} certificate(s) need rendering")
+        if options['dry_run'] or not stale:
+            return
+
+        started = time.monotonic()
+        done = failed = 0
+        for certificate_id, _, error in render_certificates(
+            stale, workers=options['workers'], chunk_size=options['chunk_size'], store=True
+        ):
+            done += 1
+            if error:
+                failed += 1
+                self.stderr.write(f"Failed to render {certificate_id}: {error}")
+            if done % options['progress_every'] == 0 or done == len(stale):
+                rate = done / max(time.monotonic() - started, 1e-6)
+                self.stdout.write(f"{done}/{len(stale)} rendered ({rate:.1f}/s)")
+
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(f"Rendered {done - failed} certificate(s), {failed} failed"))
+
+    def find_stale(self, queryset):
+        """Certificate ids without a stored render for their current fingerprint"""
+        storage = get_pdf_storage()
+        return [
+            certificate.certificate_id
+            for certificate in queryset.select_related('student__user', 'course').iterator(chunk_size=500)
+            if not storage.exists(pdf_cache_name(certificate))
+        ]
@@ -0,0 +1,58 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from certificates.jobs import claim_job, expire_job_results, run_job
+
+# Seconds between sweeps for expired job results
+EXPIRY_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs queued background jobs (exports, password resets, bulk validity changes). '
+        'Start as many workers as needed; each job is picked up by exactly one of them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Seconds to wait before polling an empty queue again')
+        parser.add_argument('--name', default=f'{socket.gethostname()}:{os.getpid()}',
+                            help='Worker name recorded on the jobs it runs')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        # Finish the current job on SIGTERM/SIGINT instead of leaving it half done
+        previous_handlers = {signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            self.work(options)
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+    def work(self, options):
+        self.stdout.write(f"Worker {options['name']} waiting for jobs")
+        next_expiry = 0
+        while not self.stopping:
+            close_old_connections()
+            if time.monotonic() >= next_expiry:
+                expire_job_results()
+                next_expiry = time.monotonic() + EXPIRY_INTERVAL
+            job = claim_job(options['name'])
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+            self.stdout.write(f"Running {job}")
+            started = time.monotonic()
+            run_job(job)
+            style = self.style.SUCCESS if job.status == job.DONE else self.style.ERROR
+            self.stdout.write(style(f"{job} {job.get_status_display().lower()} in {time.monotonic() - started:.1f}s"))
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,195 @@
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import cache
+
+# Upper bounds of the latency histogram buckets, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Each process publishes its totals to the shared cache this often, so the
+# metrics endpoint can report on every worker, not just the one serving it
+FLUSH_INTERVAL = 10
+SNAPSHOT_TIMEOUT = 60 * 60
+PROCESSES_KEY = 'metrics:processes'
+
+HELP = {
+    'certifier_request_duration_seconds': ('histogram', 'Wall time of requests by view'),
+    'certifier_responses_total': ('counter', 'Responses by view and status code'),
+    'certifier_db_queries_total': ('counter', 'Database queries by view'),
+    'certifier_db_duration_seconds_total': ('counter', 'Time spent in database queries by view'),
+    'certifier_cache_requests_total': ('counter', 'Application cache lookups by cache and result'),
+    'certifier_pdf_render_duration_seconds': ('histogram', 'Time to render a certificate PDF'),
+}
+
+
+class RequestMetrics:
+    """What one request spent its time on"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.render_count = 0
+        self.render_time = 0.0
+
+    @property
+    def duration(self):
+        return time.perf_counter() - self.started
+
+
+_current = ContextVar('request_metrics', default=None)
+
+
+@contextmanager
+def track_request():
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+class Registry:
+    """Process-wide counters and histograms keyed by (name, labels)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def increment(self, name, labels=(), value=1):
+        key = (name, tuple(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        key = (name, tuple(labels))
+        with self.lock:
+            # Cumulative count per bucket, then the sum and the total count
+            histogram = self.histograms.setdefault(key, [0] * (len(DURATION_BUCKETS) + 2))
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': list(self.counters.items()),
+                'histograms': [(key, list(values)) for key, values in self.histograms.items()],
+            }
+
+
+registry = Registry()
+
+
+def record_cache(cache_name, hits=0, misses=0):
+    """Count lookups in one of the application caches (verification, pdf...)"""
+    if hits:
+        registry.increment('certifier_cache_requests_total', (('cache', cache_name), ('result', 'hit')), hits)
+    if misses:
+        registry.increment('certifier_cache_requests_total', (('cache', cache_name), ('result', 'miss')), misses)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+@contextmanager
+def time_render():
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe('certifier_pdf_render_duration_seconds', elapsed)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.render_count += 1
+            metrics.render_time += elapsed
+
+
+def record_request(view_name, status_code, metrics):
+    view = (('view', view_name),)
+    registry.observe('certifier_request_duration_seconds', metrics.duration, view)
+    registry.increment('certifier_responses_total', view + (('status', str(status_code)),))
+    registry.increment('certifier_db_queries_total', view, metrics.db_queries)
+    registry.increment('certifier_db_duration_seconds_total', view, metrics.db_time)
+
+
+_process_id = f"{socket.gethostname()}:{os.getpid()}"
+_last_flush = 0
+
+
+def flush_due():
+    return time.monotonic() - _last_flush >= FLUSH_INTERVAL
+
+
+def flush(force=False):
+    """Publish this process's totals to the shared cache"""
+    global _last_flush
+    if not force and not flush_due():
+        return
+    _last_flush = time.monotonic()
+    cache.set(f'metrics:snapshot:{_process_id}', registry.snapshot(), SNAPSHOT_TIMEOUT)
+    processes = cache.get(PROCESSES_KEY, [])
+    if _process_id not in processes:
+        cache.set(PROCESSES_KEY, [*processes[-99:], _process_id], None)
+
+
+def collect():
+    """Sum the published totals of every process, this one included"""
+    flush(force=True)
+    processes = cache.get(PROCESSES_KEY, [])
+    snapshots = cache.get_many([f'metrics:snapshot:{process}' for process in processes])
+    counters, histograms = {}, {}
+    for snapshot in snapshots.values():
+        for (name, labels), value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for (name, labels), values in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, [0] * len(values))
+            for index, value in enumerate(values):
+                total[index] += value
+    return counters, histograms
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render_prometheus(counters, histograms):
+    """Format collected metrics in the Prometheus text exposition format"""
+    lines = []
+    for name, (kind, description) in HELP.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+            continue
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            # Buckets are stored cumulative already
+            for bound, count in zip(DURATION_BUCKETS, values):
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {count}')
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {values[-1]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {values[-2]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {values[-1]}')
+    return '\n'.join(lines) + '\n'
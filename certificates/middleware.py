@@ -0,0 +1,106 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger('certificates.requests')
+
+
+class RequestMetricsMiddleware:
+    """Time each request and count its database queries, cache lookups and PDF renders.
+
+    Adds a Server-Timing header (visible in browser dev tools), logs one
+    JSON line per request to the 'certificates.requests' logger and feeds
+    the histograms served by the metrics view. Install it first so the
+    timing covers the other middleware too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with metrics.track_request() as request_metrics, ExitStack() as stack:
+            time_queries(stack, request_metrics)
+            response = self.get_response(request)
+        self.finish(request, response, request_metrics)
+        metrics.flush()
+        return response
+
+    async def __acall__(self, request):
+        with metrics.track_request() as request_metrics:
+            # Async views run their queries in the request's sync thread, so hook its connections
+            stack = ExitStack()
+            await sync_to_async(time_queries)(stack, request_metrics)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        self.finish(request, response, request_metrics)
+        if metrics.flush_due():
+            # Publishing writes to the cache, which may block
+            await sync_to_async(metrics.flush)()
+        return response
+
+    def finish(self, request, response, request_metrics):
+        """Record the request's metrics, add its Server-Timing header and log it"""
+        view_name = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+        metrics.record_request(view_name, response.status_code, request_metrics)
+        response['Server-Timing'] = server_timing(request_metrics)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'view': view_name,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(request_metrics.duration * 1000, 2),
+                'db_queries': request_metrics.db_queries,
+                'db_ms': round(request_metrics.db_time * 1000, 2),
+                'cache_hits': request_metrics.cache_hits,
+                'cache_misses': request_metrics.cache_misses,
+                'renders': request_metrics.render_count,
+                'render_ms': round(request_metrics.render_time * 1000, 2),
+            }))
+
+
+def time_queries(stack, request_metrics):
+    wrapper = QueryTimer(request_metrics)
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+
+
+class QueryTimer:
+    """connection.execute_wrapper hook adding each query to the request's totals"""
+
+    def __init__(self, request_metrics):
+        self.request_metrics = request_metrics
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.request_metrics.db_queries += 1
+            self.request_metrics.db_time += time.perf_counter() - started
+
+
+def server_timing(request_metrics):
+    parts = [
+        f'db;dur={request_metrics.db_time * 1000:.1f};desc="{request_metrics.db_queries} queries"',
+        f'cache;desc="{request_metrics.cache_hits} hits, {request_metrics.cache_misses} misses"',
+    ]
+    if request_metrics.render_count:
+        parts.append(f'render;dur={request_metrics.render_time * 1000:.1f}')
+    parts.append(f'total;dur={request_metrics.duration * 1000:.1f}')
+    return ', '.join(parts)
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:11
+
+from django.db import DatabaseError, migrations, models, transaction
+
+# Trigram indexes backing CertificateAdmin.search_fields. Django compiles
+# icontains to UPPER(column::text) LIKE UPPER(...) on PostgreSQL, so the
+# indexes are built on that expression.
+TRIGRAM_INDEXES = [
+    ('cert_search_id_trgm', 'certificates_certificate', 'certificate_id'),
+    ('cert_search_grade_trgm', 'certificates_certificate', 'grade'),
+    ('course_search_name_trgm', 'certificates_course', 'name'),
+    ('user_search_email_trgm', 'auth_user', 'email'),
+    ('user_search_first_name_trgm', 'auth_user', 'first_name'),
+    ('user_search_last_name_trgm', 'auth_user', 'last_name'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # SQLite can't use an index for LIKE '%term%' at all, so there is no fallback index
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError:
+        # Hosts that don't allow the extension keep working without the indexes
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('certificates', '0004_remove_certificate_score_alter_certificate_end_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['student', '-issue_date', '-id'], name='cert_student_issued_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['course', 'is_valid'], name='cert_course_valid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['issue_date'], name='cert_issue_date_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:13
+
+import re
+
+from django.db import DatabaseError, migrations, models, transaction
+
+FTS_TABLE = 'certificates_certificate_fts'
+
+SQLITE_FTS_SQL = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(search_document)",
+    f"""CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON certificates_certificate BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF search_document ON certificates_certificate BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON certificates_certificate BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"INSERT INTO {FTS_TABLE}(rowid, search_document) SELECT id, search_document FROM certificates_certificate",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS cert_search_document_gin "
+            "ON certificates_certificate USING gin (to_tsvector('simple', search_document))"
+        )
+    elif vendor == 'sqlite':
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                for sql in SQLITE_FTS_SQL:
+                    schema_editor.execute(sql)
+        except DatabaseError:
+            # SQLite built without FTS5: admin search falls back to icontains
+            pass
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS cert_search_document_gin")
+    elif vendor == 'sqlite':
+        for trigger in ('insert', 'update', 'delete'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{trigger}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+# Frozen copy of certificates.search.build_search_document as of this
+# migration, so later changes to the app don't alter what it writes
+def build_search_document(first_name, last_name, email, course_name, grade, certificate_id):
+    return ' '.join(filter(None, [
+        first_name,
+        last_name,
+        email,
+        re.sub(r'[@._+-]', ' ', email),
+        course_name,
+        grade,
+        str(certificate_id),
+    ]))
+
+
+def populate_search_documents(apps, schema_editor, batch_size=1000):
+    Certificate = apps.get_model('certificates', 'Certificate')
+    rows = Certificate.objects.using(schema_editor.connection.alias).values_list(
+        'pk', 'student__user__first_name', 'student__user__last_name', 'student__user__email',
+        'course__name', 'grade', 'certificate_id',
+    )
+    sql = "UPDATE certificates_certificate SET search_document = %s WHERE id = %s"
+    batch = []
+    for pk, *fields in rows.iterator(chunk_size=batch_size):
+        batch.append((build_search_document(*fields), pk))
+        if len(batch) >= batch_size:
+            with schema_editor.connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+            batch = []
+    if batch:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(sql, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0005_certificate_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='search_document',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import migrations
+from django.utils import timezone
+
+OLD_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+NEW_BACKEND = 'certificates.backends.StudentModelBackend'
+
+
+def move_sessions_to_student_backend(apps, schema_editor):
+    """Keep users signed in by the stock ModelBackend, which is no longer listed"""
+    Session = apps.get_model('sessions', 'Session')
+    store = SessionStore()
+    for session in Session.objects.filter(expire_date__gt=timezone.now()).iterator():
+        data = store.decode(session.session_data)
+        if data.get('_auth_user_backend') == OLD_BACKEND:
+            data['_auth_user_backend'] = NEW_BACKEND
+            session.session_data = store.encode(data)
+            session.save(update_fields=['session_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0007_job'),
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_sessions_to_student_backend, migrations.RunPython.noop),
+    ]
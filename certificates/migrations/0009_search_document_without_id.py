@@ -0,0 +1,47 @@
+import re
+
+from django.db import migrations
+
+
+# Frozen copy of certificates.search.build_search_document as of this
+# migration, so later changes to the app don't alter what it writes
+def build_search_document(first_name, last_name, email, course_name, grade):
+    return ' '.join(filter(None, [
+        first_name,
+        last_name,
+        email,
+        re.sub(r'[@._+-]', ' ', email),
+        course_name,
+        re.sub(r'(\w)([+-])(?!\w)', lambda match: match[1] + {'+': 'plus', '-': 'minus'}[match[2]], grade or ''),
+    ]))
+
+
+def drop_certificate_ids(apps, schema_editor, batch_size=1000):
+    """Rebuild the stored search documents without the certificate id and with grade signs spelt out"""
+    Certificate = apps.get_model('certificates', 'Certificate')
+    rows = Certificate.objects.using(schema_editor.connection.alias).values_list(
+        'pk', 'student__user__first_name', 'student__user__last_name', 'student__user__email',
+        'course__name', 'grade',
+    )
+    sql = "UPDATE certificates_certificate SET search_document = %s WHERE id = %s"
+    batch = []
+    for pk, *fields in rows.iterator(chunk_size=batch_size):
+        batch.append((build_search_document(*fields), pk))
+        if len(batch) >= batch_size:
+            with schema_editor.connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+            batch = []
+    if batch:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(sql, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0008_student_backend_sessions'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_certificate_ids, migrations.RunPython.noop),
+    ]
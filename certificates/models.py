@@ -1,17 +1,12 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
-import qrcode
-from io import BytesIO
-from django.core.files import File
-from PIL import Image, ImageDraw
-from django.urls import reverse
-from django.contrib.sites.shortcuts import get_current_site
 import uuid
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 import random
 import string
 from django.utils import timezone
+from django.utils.module_loading import import_string
+from .qr import get_qr_matrix, render_qr_png
 
 class Student(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -44,34 +39,83 @@ class Certificate(models.Model):
     end_date = models.DateTimeField(null=True, blank=True, help_text="Course end date")
     is_valid = models.BooleanField(default=True)
     grade = models.TextField(help_text="Student's grade in the course", null=True, blank=True)
+    # Denormalized text for staff search, kept up to date by signals
+    search_document = models.TextField(default='', editable=False)
+
+    class Meta:
+        indexes = [
+            # Student dashboard: a student's certificates, newest first
+            models.Index(fields=['student', '-issue_date', '-id'], name='cert_student_issued_idx'),
+            # Admin course/validity filters and course exports
+            models.Index(fields=['course', 'is_valid'], name='cert_course_valid_idx'),
+            # Admin issue_date filter and ordering
+            models.Index(fields=['issue_date'], name='cert_issue_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.user.get_full_name()} - {self.course.name}"
 
+    def get_qr_matrix(self):
+        """QR code module matrix for certificate verification"""
+        return get_qr_matrix(str(self.certificate_id))
+
     def get_qr_code(self):
-        # Generate QR code for certificate verification
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )        # The URL that will be used to verify the certificate
-        verification_url = reverse('certificates:verify')
-        # Add the certificate ID as a query parameter
-        verification_url = f"{verification_url}?certificate_id={self.certificate_id}"
-        # Make the URL absolute by adding the domain
-        absolute_url = f"https://certifier.onrender.com{verification_url}"
-        qr.add_data(absolute_url)
-        qr.make(fit=True)
-
-        # Create QR code image
-        qr_image = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convert to bytes
-        buffer = BytesIO()
-        qr_image.save(buffer, format="PNG")
-        return buffer.getvalue()
+        # Generate QR code for certificate verification as PNG bytes
+        return render_qr_png(self.get_qr_matrix())
 
     def is_currently_valid(self):
         """Check if the certificate is valid"""
         return self.is_valid
+
+
+def get_job_storage():
+    """Storage for job result files, only downloadable through the admin"""
+    storage_class = import_string(getattr(
+        settings, 'JOB_RESULT_STORAGE', 'django.core.files.storage.FileSystemStorage'
+    ))
+    options = getattr(settings, 'JOB_RESULT_OPTIONS', None)
+    if options is None:
+        options = {'location': settings.MEDIA_ROOT / 'job_results'}
+    return storage_class(**options)
+
+
+class Job(models.Model):
+    """A heavy admin operation queued for the run_worker command"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    arguments = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    message = models.TextField(blank=True)
+    # Downloadable output such as export archives or new passwords
+    result_file = models.FileField(storage=get_job_storage, upload_to='%Y/%m/', blank=True)
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Workers claim the oldest queued job
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk}"
+
+    def get_kind_display(self):
+        from .jobs import get_job_label
+        return get_job_label(self.kind)
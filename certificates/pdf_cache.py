@@ -0,0 +1,178 @@
+import contextlib
+import hashlib
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .metrics import record_cache, time_render
+from .rendering import TEMPLATE_VERSION, get_certificate_template
+
+_storage = None
+_render_executor = None
+_render_executor_lock = threading.Lock()
+
+
+def get_pdf_storage():
+    """Storage backend holding rendered certificate PDFs"""
+    global _storage
+    if _storage is None:
+        storage_class = import_string(getattr(
+            settings, 'CERTIFICATE_PDF_CACHE_STORAGE',
+            'django.core.files.storage.FileSystemStorage'
+        ))
+        options = getattr(settings, 'CERTIFICATE_PDF_CACHE_OPTIONS', None)
+        if options is None:
+            options = {'location': settings.MEDIA_ROOT / 'certificate_pdfs'}
+        _storage = storage_class(**options)
+    return _storage
+
+
+@receiver(setting_changed)
+def reset_pdf_storage(setting, **kwargs):
+    global _storage
+    if setting in ('CERTIFICATE_PDF_CACHE_STORAGE', 'CERTIFICATE_PDF_CACHE_OPTIONS'):
+        _storage = None
+
+
+def certificate_fingerprint(certificate):
+    """Hash of everything that ends up in the rendered PDF"""
+    user = certificate.student.user
+    parts = [
+        str(TEMPLATE_VERSION),
+        get_certificate_template().digest,
+        str(certificate.certificate_id),
+        user.get_full_name() or user.email,
+        certificate.course.name,
+        str(certificate.course.duration),
+        certificate.start_date.isoformat(),
+        certificate.end_date.isoformat() if certificate.end_date else '',
+        certificate.grade or '',
+        str(certificate.is_valid),
+    ]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def pdf_cache_name(certificate, fingerprint=None):
+    fingerprint = fingerprint or certificate_fingerprint(certificate)
+    return f"{certificate.certificate_id}/{fingerprint}.pdf"
+
+
+def store_certificate_pdf(certificate, fingerprint=None):
+    """Make sure the current render of a certificate is stored and return its name"""
+    from .views import generate_certificate_pdf
+
+    storage = get_pdf_storage()
+    name = pdf_cache_name(certificate, fingerprint)
+    if storage.exists(name):
+        record_cache('pdf', hits=1)
+    else:
+        record_cache('pdf', misses=1)
+        with time_render():
+            pdf = generate_certificate_pdf(certificate)
+        _save_pdf(storage, name, pdf)
+    return name
+
+
+def _save_pdf(storage, name, pdf):
+    """Store a render so that readers never see it half written"""
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        # Remote storages only expose an object once it is fully uploaded
+        saved_name = storage.save(name, ContentFile(pdf))
+        if saved_name != name:
+            # Another worker stored the same render first
+            storage.delete(saved_name)
+        return
+
+    # Local files are written under a temporary name and renamed into place
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f".{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temp_path, 'xb') as f:
+            f.write(pdf)
+        if storage.file_permissions_mode is not None:
+            os.chmod(temp_path, storage.file_permissions_mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_path)
+        raise
+
+
+def get_certificate_pdf(certificate, fingerprint=None):
+    """Open the cached PDF for a certificate, rendering and storing it on a miss"""
+    return get_pdf_storage().open(store_certificate_pdf(certificate, fingerprint), 'rb')
+
+
+def get_render_executor():
+    """Bounded pool that async views render and read PDFs in.
+
+    Its size, CERTIFICATE_PDF_RENDER_WORKERS, caps how many renders run
+    at once per process; further requests wait for a free thread while
+    the event loop keeps serving other views.
+    """
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is None:
+            _render_executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'CERTIFICATE_PDF_RENDER_WORKERS', 4),
+                thread_name_prefix='pdf-render',
+            )
+    return _render_executor
+
+
+def get_pdf_state(certificate):
+    """Fingerprint of a certificate's current render, and when it was stored (None if not yet)"""
+    fingerprint = certificate_fingerprint(certificate)
+    return fingerprint, get_pdf_modified_time(certificate, fingerprint)
+
+
+def _read_certificate_pdf(certificate, fingerprint):
+    with get_certificate_pdf(certificate, fingerprint) as pdf_file:
+        pdf = pdf_file.read()
+    return pdf, get_pdf_modified_time(certificate, fingerprint)
+
+
+def in_render_pool(func):
+    """Async wrapper running func in the render pool"""
+    return sync_to_async(func, thread_sensitive=False, executor=get_render_executor())
+
+
+async def aget_pdf_state(certificate):
+    # Fingerprinting stats the template, and loads and hashes it on first use
+    return await in_render_pool(get_pdf_state)(certificate)
+
+
+async def aread_certificate_pdf(certificate, fingerprint=None):
+    """Return the PDF bytes and stored time of a certificate, rendering it in the render pool"""
+    return await in_render_pool(_read_certificate_pdf)(certificate, fingerprint)
+
+
+def get_pdf_modified_time(certificate, fingerprint=None):
+    """When the cached render was stored, or None if the backend can't tell"""
+    try:
+        return get_pdf_storage().get_modified_time(pdf_cache_name(certificate, fingerprint))
+    except (OSError, NotImplementedError):
+        return None
+
+
+def invalidate_certificate_pdfs(certificate_ids):
+    """Remove every cached render of the given certificates"""
+    storage = get_pdf_storage()
+    for certificate_id in certificate_ids:
+        try:
+            _, files = storage.listdir(str(certificate_id))
+        except (FileNotFoundError, NotImplementedError):
+            continue
+        for filename in files:
+            storage.delete(f"{certificate_id}/{filename}")
@@ -0,0 +1,79 @@
+from functools import lru_cache
+from io import BytesIO
+
+import qrcode
+from django.core.cache import cache
+from django.urls import reverse
+from PIL import Image
+
+VERIFICATION_HOST = 'https://certifier.onrender.com'
+
+# QR codes never change for a given certificate
+QR_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def get_verification_url(certificate_id):
+    """Absolute URL of the public verify page for a certificate"""
+    verification_url = reverse('certificates:verify')
+    return f"{VERIFICATION_HOST}{verification_url}?certificate_id={certificate_id}"
+
+
+@lru_cache(maxsize=1024)
+def get_qr_matrix(certificate_id):
+    """Module matrix of the verification QR code, border included.
+
+    Rows are strings of '1' (dark) and '0' (light) modules. Results are
+    memoized per process and shared between workers through the cache.
+    """
+    cache_key = f"qr_matrix:{certificate_id}"
+    matrix = cache.get(cache_key)
+    if matrix is None:
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            box_size=10,
+            border=4,
+        )
+        qr.add_data(get_verification_url(certificate_id))
+        qr.make(fit=True)
+        matrix = tuple(
+            ''.join('1' if module else '0' for module in row)
+            for row in qr.get_matrix()
+        )
+        cache.set(cache_key, matrix, QR_CACHE_TIMEOUT)
+    return matrix
+
+
+def draw_qr_code(c, matrix, x, y, size):
+    """Draw a QR matrix onto a ReportLab canvas as vector rectangles"""
+    module = size / len(matrix)
+    c.saveState()
+    c.setFillColorRGB(1, 1, 1)
+    c.rect(x, y, size, size, stroke=0, fill=1)
+    c.setFillColorRGB(0, 0, 0)
+    path = c.beginPath()
+    for row_index, row in enumerate(matrix):
+        row_y = y + size - (row_index + 1) * module
+        col = 0
+        # Merge horizontal runs of dark modules into a single rectangle
+        while col < len(row):
+            if row[col] == '1':
+                start = col
+                while col < len(row) and row[col] == '1':
+                    col += 1
+                path.rect(x + start * module, row_y, (col - start) * module, module)
+            else:
+                col += 1
+    c.drawPath(path, stroke=0, fill=1)
+    c.restoreState()
+
+
+def render_qr_png(matrix, box_size=10):
+    """Encode a QR matrix as a black-on-white PNG"""
+    size = len(matrix)
+    image = Image.new('1', (size, size))
+    image.putdata([0 if module == '1' else 1 for row in matrix for module in row])
+    image = image.resize((size * box_size, size * box_size), Image.NEAREST)
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
@@ -0,0 +1,108 @@
+import math
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from ipware import get_client_ip
+
+RATE_PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+# Final counts of already closed windows, so steady-state requests only
+# cost the increment of the current window
+_closed_windows = {}
+_CLOSED_WINDOWS_MAX = 10000
+
+
+def parse_rate(rate):
+    """Turn '60/m' into (60, 60)"""
+    count, period = rate.split('/')
+    return int(count), RATE_PERIODS[period[-1]] * int(period[:-1] or 1)
+
+
+def _increment(key, window):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # First hit of the window; add() loses to a concurrent first hit cleanly
+        if cache.add(key, 1, window * 2):
+            return 1
+        return cache.incr(key)
+
+
+def _closed_window_count(key):
+    if key not in _closed_windows:
+        if len(_closed_windows) >= _CLOSED_WINDOWS_MAX:
+            _closed_windows.clear()
+        _closed_windows[key] = cache.get(key, 0)
+    return _closed_windows[key]
+
+
+def hit(scope, identity, limit, window):
+    """Count a request against a sliding-window budget.
+
+    The previous window's count is weighted by how much of it still
+    overlaps the sliding window. Returns 0 when the request is allowed,
+    otherwise the number of seconds to wait before retrying. Counters are
+    shared through the cache and incremented atomically, so the budget
+    holds across processes on a shared backend.
+    """
+    now = time.time()
+    index, offset = divmod(now, window)
+    prefix = f"ratelimit:{scope}:{window}:{identity}"
+    current = _increment(f"{prefix}:{int(index)}", window)
+    if current > limit:
+        return max(math.ceil(window - offset), 1)
+
+    previous = _closed_window_count(f"{prefix}:{int(index) - 1}")
+    elapsed = offset / window
+    if previous * (1 - elapsed) + current <= limit:
+        return 0
+    # Wait until enough of the previous window has slid out
+    needed = 1 - (limit - current) / previous
+    return max(math.ceil((needed - elapsed) * window), 1)
+
+
+def get_rate(scope, default):
+    return getattr(settings, 'RATE_LIMITS', {}).get(scope, default)
+
+
+def check_rate_limit(scope, rate, request):
+    """Count a request against its client's budget; return an error response if it is over"""
+    limit, window = parse_rate(get_rate(scope, rate))
+    client_ip, _ = get_client_ip(request)
+    if not client_ip:
+        return HttpResponse("Cannot determine client IP address.", status=403)
+    retry_after = hit(scope, client_ip, limit, window)
+    if retry_after:
+        response = HttpResponse("Too many requests. Please try again later.", status=429)
+        response['Retry-After'] = str(retry_after)
+        return response
+    return None
+
+
+def rate_limited(scope, rate):
+    """Limit a view per client IP; the rate can be overridden in settings.RATE_LIMITS"""
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if getattr(settings, 'RATE_LIMITS_ENABLED', True):
+                    # The counters live in the cache, which may do blocking I/O
+                    response = await sync_to_async(check_rate_limit)(scope, rate, request)
+                    if response is not None:
+                        return response
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if getattr(settings, 'RATE_LIMITS_ENABLED', True):
+                response = check_rate_limit(scope, rate, request)
+                if response is not None:
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
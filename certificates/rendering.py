@@ -0,0 +1,108 @@
+import copy
+import hashlib
+import os
+
+from django.contrib.staticfiles import finders
+from PIL import Image
+from reportlab.pdfbase import pdfdoc
+
+BACKGROUND_IMAGE = 'certificates/images/certificate_background.jpg'
+
+# Bump whenever the certificate layout changes so cached renders are refreshed
+TEMPLATE_VERSION = 2
+
+_template = None
+
+
+class CertificateTemplate:
+    """Background image and page layout shared by every certificate render.
+
+    Resolving the static file, reading its size and encoding the JPEG into a
+    PDF image XObject are done once; renders copy the prepared XObject into
+    their own document instead of re-reading the file from disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime
+
+        # Get exact dimensions from background image
+        with Image.open(path) as img:
+            self.width, self.height = img.size
+
+        # Identifies the background by content, so every box and deploy agrees on it
+        with open(path, 'rb') as f:
+            self.digest = hashlib.sha256(f.read()).hexdigest()
+
+        self.xobject = pdfdoc.PDFImageXObject(path, path)
+        self.xobject_name = f"certificate_background_{self.digest[:16]}"
+        self.xobject.name = self.xobject_name
+
+        # Positions and font sizes relative to image dimensions
+        width, height = self.width, self.height
+        self.center_x = width / 2
+        self.name_y = height * 0.37
+        self.course_y = height * 0.25
+        self.dates_y = height * 0.125
+        self.dates_x = width * 0.27
+        self.dates_to_x = width * 0.45
+        self.grade_y = self.dates_y - int(height * 0.035)
+        self.duration_y = self.dates_y - int(height * 0.065)
+        self.id_x = width * 0.05
+        self.id_y = height * 0.04
+        self.name_font_size = int(height * 0.04)
+        self.course_font_size = int(height * 0.035)
+        self.dates_font_size = int(height * 0.025)
+        self.id_font_size = int(height * 0.015)
+        self.qr_size = int(height * 0.15)
+        self.qr_x = width - (self.qr_size * 9)
+        self.qr_y = height * 0.07
+
+    def is_stale(self):
+        """Check whether the background file changed since it was loaded"""
+        try:
+            return os.stat(self.path).st_mtime != self.mtime
+        except OSError:
+            return True
+
+    def draw_background(self, c):
+        """Draw the pre-encoded background image over the whole page.
+
+        ReportLab has no public way to share an encoded image between
+        documents (drawImage re-encodes it on every render, several times
+        slower), so this registers the XObject through canvas internals.
+        reportlab is pinned for that; RenderingTests fails if they change.
+        """
+        doc = c._doc
+        reg_name = doc.getXObjectName(self.xobject_name)
+        if doc.idToObject.get(reg_name) is None:
+            # Each document gets its own shallow copy; the encoded stream is shared
+            xobject = copy.copy(self.xobject)
+            xobject.XObjects = None
+            doc.Reference(xobject, reg_name)
+            doc.addForm(self.xobject_name, xobject)
+
+        c._currentPageHasImages = 1
+        c.saveState()
+        c.scale(self.width, self.height)
+        c._code.append(f"/{reg_name} Do")
+        c.restoreState()
+        c._formsinuse.append(self.xobject_name)
+
+
+def load_certificate_template():
+    """Resolve the background image and build a fresh template"""
+    global _template
+    bg_image_path = finders.find(BACKGROUND_IMAGE)
+    if not bg_image_path:
+        raise ValueError("Certificate background image not found")
+    _template = CertificateTemplate(bg_image_path)
+    return _template
+
+
+def get_certificate_template():
+    """Return the process-wide template, reloading it if the file changed"""
+    template = _template
+    if template is None or template.is_stale():
+        template = load_certificate_template()
+    return template
@@ -0,0 +1,258 @@
+import csv
+from dataclasses import dataclass, field
+from datetime import datetime, time as datetime_time
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .credentials import PasswordHasherPool
+from .models import Certificate, Course, Student
+from .search import build_search_document
+from .verification import register_certificate_ids
+
+# A row with a course also issues a certificate; grade, start_date and end_date are optional
+REQUIRED_COLUMNS = ('email', 'first_name', 'last_name', 'phone')
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class RosterError(ValueError):
+    """The roster file as a whole can't be imported"""
+
+
+@dataclass
+class RosterImportResult:
+    rows: int = 0
+    students_created: int = 0
+    certificates_created: int = 0
+    errors: int = 0
+    # Only the first few errors are kept; the rest are counted and passed to on_error
+    error_samples: list = field(default_factory=list)
+
+    MAX_ERROR_SAMPLES = 100
+
+    def add_error(self, line, message):
+        self.errors += 1
+        if len(self.error_samples) < self.MAX_ERROR_SAMPLES:
+            self.error_samples.append((line, message))
+
+
+@dataclass
+class _Row:
+    line: int
+    email: str
+    first_name: str
+    last_name: str
+    phone: str
+    course: Course = None
+    grade: str = None
+    start_date: datetime = None
+    end_date: datetime = None
+
+
+def read_roster_csv(file):
+    """Yield (line number, row dict) from a CSV roster, one row at a time.
+
+    Header names are matched case-insensitively. file must be a text
+    stream opened with newline=''.
+    """
+    reader = csv.reader(file)
+    header = next(reader, None)
+    if header is None:
+        raise RosterError("The roster file is empty.")
+    header = [column.strip().lower() for column in header]
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise RosterError(f"Missing column(s): {', '.join(missing)}")
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        yield reader.line_num, dict(zip(header, (value.strip() for value in values)))
+
+
+def _parse_roster_datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError
+        parsed = datetime.combine(day, datetime_time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _clean_row(line, values, courses):
+    """Validate one roster row, returning a _Row or raising ValidationError"""
+    email = values.get('email', '').lower()
+    validate_email(email)
+    for column in ('first_name', 'last_name', 'phone'):
+        if not values.get(column):
+            raise ValidationError(f"{column} is required")
+    if len(values['phone']) > Student._meta.get_field('phone').max_length:
+        raise ValidationError("phone is too long")
+    row = _Row(line, email, values['first_name'][:150], values['last_name'][:150], values['phone'])
+
+    course_name = values.get('course')
+    if course_name:
+        row.course = courses.get(course_name.lower())
+        if row.course is None:
+            raise ValidationError(f"Unknown course: {course_name}")
+        row.grade = values.get('grade') or None
+        for column in ('start_date', 'end_date'):
+            if values.get(column):
+                try:
+                    setattr(row, column, _parse_roster_datetime(values[column]))
+                except ValueError:
+                    raise ValidationError(f"Invalid {column}: {values[column]}")
+    return row
+
+
+def _load_courses():
+    """Courses by lower-cased name and by id"""
+    courses = {}
+    for course in Course.objects.all():
+        courses.setdefault(course.name.lower(), course)
+        courses[str(course.pk)] = course
+    return courses
+
+
+def _import_rows(rows, result, hasher):
+    """Create the users, students and certificates of validated rows.
+
+    Rows whose student already exists (in the database or earlier in the
+    same chunk) only add a certificate. Everything is written in one
+    transaction; an IntegrityError rolls it back for the caller to retry.
+    Returns the (line, message) errors of rows that were skipped.
+    """
+    errors = []
+    emails = {row.email for row in rows}
+    users = {
+        user.username: user
+        for user in User.objects.filter(username__in=emails).select_related('student')
+    }
+    taken_phones = set(
+        Student.objects.filter(phone__in={row.phone for row in rows}).values_list('phone', flat=True)
+    )
+
+    new_students = {}
+    certificate_rows = []
+    for row in rows:
+        user = users.get(row.email)
+        if user is not None:
+            student = getattr(user, 'student', None)
+            if student is None:
+                errors.append((row.line, f"{row.email} belongs to a user who is not a student"))
+                continue
+        elif row.email in new_students:
+            student = new_students[row.email]
+        else:
+            if row.phone in taken_phones:
+                errors.append((row.line, f"Phone {row.phone} is already used by another student"))
+                continue
+            taken_phones.add(row.phone)
+            user = User(
+                username=row.email,
+                email=row.email,
+                first_name=row.first_name,
+                last_name=row.last_name,
+            )
+            student = new_students[row.email] = Student(user=user, phone=row.phone)
+        if row.course is not None:
+            certificate_rows.append((row, student))
+
+    # Same initial password as the admin form: the phone number
+    hashes = hasher.hash(student.phone for student in new_students.values())
+    for student, hashed in zip(new_students.values(), hashes):
+        student.user.password = hashed
+
+    # Re-importing a roster must not issue the same course twice
+    existing_students = [student.pk for _, student in certificate_rows if student.pk]
+    issued = set(
+        Certificate.objects.filter(student__in=existing_students)
+        .values_list('student_id', 'course_id')
+    ) if existing_students else set()
+
+    certificates = []
+    for row, student in certificate_rows:
+        # New students have no pk yet; their email is unique within the chunk
+        key = (student.pk or row.email, row.course.pk)
+        if key in issued:
+            errors.append((row.line, f"{row.email} already has a certificate for {row.course.name}"))
+            continue
+        issued.add(key)
+        certificate = Certificate(
+            student=student,
+            course=row.course,
+            grade=row.grade,
+            start_date=row.start_date or timezone.now(),
+            end_date=row.end_date,
+        )
+        certificates.append(certificate)
+
+    with transaction.atomic():
+        User.objects.bulk_create([student.user for student in new_students.values()])
+        Student.objects.bulk_create(new_students.values())
+        for certificate in certificates:
+            # bulk_create skips the pre_save signal that normally fills this
+            certificate.search_document = build_search_document(certificate)
+        Certificate.objects.bulk_create(certificates)
+
+    result.students_created += len(new_students)
+    result.certificates_created += len(certificates)
+    if certificates:
+        register_certificate_ids([certificate.certificate_id for certificate in certificates])
+    return errors
+
+
+def import_roster(rows, chunk_size=DEFAULT_CHUNK_SIZE, on_error=None, on_chunk=None):
+    """Import (line number, row dict) pairs, e.g. from read_roster_csv.
+
+    Rows are validated and written chunk_size at a time, each chunk in
+    its own transaction, so memory stays flat however long the roster is
+    and a failed chunk never undoes earlier ones. Invalid rows are
+    reported through on_error(line, message) and skipped. If a chunk
+    hits a conflict (e.g. a concurrent import), its rows are retried one
+    by one so only the conflicting rows fail. on_chunk(result), if
+    given, is called after each chunk.
+    """
+    result = RosterImportResult()
+
+    def report(line, message):
+        result.add_error(line, message)
+        if on_error is not None:
+            on_error(line, message)
+
+    courses = _load_courses()
+    rows = iter(rows)
+    with PasswordHasherPool() as hasher:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            result.rows += len(chunk)
+            valid, errors = [], []
+            for line, values in chunk:
+                try:
+                    valid.append(_clean_row(line, values, courses))
+                except ValidationError as error:
+                    errors.append((line, '; '.join(error.messages)))
+            if valid:
+                try:
+                    errors += _import_rows(valid, result, hasher)
+                except IntegrityError:
+                    for row in valid:
+                        try:
+                            errors += _import_rows([row], result, hasher)
+                        except IntegrityError as error:
+                            errors.append((row.line, f"Could not be saved: {error}"))
+            for line, message in sorted(errors):
+                report(line, message)
+            if on_chunk is not None:
+                on_chunk(result)
+    return result
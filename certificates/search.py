@@ -0,0 +1,99 @@
+import re
+import uuid
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+# SQLite full-text table mirroring Certificate.search_document (see migration 0006)
+FTS_TABLE = 'certificates_certificate_fts'
+
+_fts_available = {}
+
+
+# A trailing + or - ends a grade ('B+', 'A-'); spelt out so it survives tokenizing
+_GRADE_SIGN = re.compile(r'(\w)([+-])(?!\w)')
+_SIGN_WORDS = {'+': 'plus', '-': 'minus'}
+
+
+def _spell_grade_signs(text):
+    return _GRADE_SIGN.sub(lambda match: match[1] + _SIGN_WORDS[match[2]], text)
+
+
+def build_search_document(certificate):
+    """Text indexed for staff search: student name and email, course and grade.
+
+    The certificate id stays out: its hex fragments would prefix-match
+    ordinary words and numbers. search_certificates matches whole UUIDs
+    against the unique index instead.
+    """
+    user = certificate.student.user
+    return ' '.join(filter(None, [
+        user.first_name,
+        user.last_name,
+        user.email,
+        # Split the email too, so any part of it matches as a word prefix
+        re.sub(r'[@._+-]', ' ', user.email),
+        certificate.course.name,
+        _spell_grade_signs(certificate.grade or ''),
+    ]))
+
+
+def refresh_search_documents(queryset, batch_size=1000):
+    """Rebuild stored search documents, e.g. after a student or course is renamed"""
+    connection = connections[queryset.db]
+    sql = (
+        f"UPDATE {queryset.model._meta.db_table} SET search_document = %s "
+        f"WHERE {queryset.model._meta.pk.column} = %s"
+    )
+    batch = []
+    certificates = queryset.select_related('student__user', 'course').iterator(chunk_size=batch_size)
+    for certificate in certificates:
+        batch.append((build_search_document(certificate), certificate.pk))
+        if len(batch) >= batch_size:
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+            batch = []
+    if batch:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, batch)
+
+
+def _sqlite_fts_available(connection):
+    if connection.alias not in _fts_available:
+        with connection.cursor() as cursor:
+            _fts_available[connection.alias] = FTS_TABLE in connection.introspection.table_names(cursor)
+    return _fts_available[connection.alias]
+
+
+def search_certificates(queryset, term):
+    """Filter certificates by a staff search term using the full-text index.
+
+    Every word of the term must prefix-match a word of the document. An
+    exact certificate UUID goes straight to the unique index. Returns
+    None when the database has no full-text index to use.
+    """
+    term = term.strip()
+    try:
+        return queryset.filter(certificate_id=uuid.UUID(term))
+    except ValueError:
+        pass
+
+    words = re.findall(r'\w+', _spell_grade_signs(term))
+    if not words:
+        return queryset
+
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        query = ' & '.join(f"{word}:*" for word in words)
+        return queryset.filter(pk__in=RawSQL(
+            "SELECT id FROM certificates_certificate "
+            "WHERE to_tsvector('simple', search_document) @@ to_tsquery('simple', %s)",
+            [query]
+        ))
+    if connection.vendor == 'sqlite' and _sqlite_fts_available(connection):
+        query = ' '.join(f'"{word}"*' for word in words)
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [query]
+        ))
+    return None
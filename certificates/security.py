@@ -1,43 +1,112 @@
-from django.core.cache import cache
-from django.core.exceptions import PermissionDenied
+import hashlib
+import math
+import time
 from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in, user_login_failed
+from django.core.cache import cache
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
 from ipware import get_client_ip
-from django.contrib import messages
-from django.shortcuts import redirect
-from django.utils import timezone
-from datetime import timedelta
-from django.http import HttpResponseForbidden
-
-def admin_brute_force_protect(view_func):
-    """Protect admin login from brute force attacks"""
+
+# Failures are forgotten after a day without new ones
+FAILURE_WINDOW = 60 * 60 * 24
+
+
+def _settings():
+    return (
+        getattr(settings, 'LOGIN_FAILURE_LIMIT', 5),
+        getattr(settings, 'LOGIN_LOCKOUT_BASE', 60),
+        getattr(settings, 'LOGIN_LOCKOUT_MAX', 60 * 60 * 24),
+    )
+
+
+def _identities(request, username):
+    """Cache key suffixes for the client IP and, when given, the username"""
+    client_ip, _ = get_client_ip(request)
+    identities = [f"ip:{client_ip}"]
+    if username:
+        digest = hashlib.sha256(username.strip().lower().encode('utf-8')).hexdigest()[:32]
+        identities.append(f"user:{digest}")
+    return identities
+
+
+def _failures_key(identity):
+    return f"login_failures:{identity}"
+
+
+def _lock_key(identity):
+    return f"login_lock:{identity}"
+
+
+def brute_force_protect(view_func):
+    """Refuse login POSTs from locked-out IPs or for locked-out usernames.
+
+    Failures are counted by the user_login_failed receiver below; this
+    only reads the lock and failure keys, in a single cache round trip.
+    """
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if not hasattr(request, 'method'):
+        if getattr(request, 'method', None) != 'POST':
             return view_func(request, *args, **kwargs)
-            
-        if request.method == 'POST':
-            client_ip, _ = get_client_ip(request)
-            if not client_ip:
-                return HttpResponseForbidden("Cannot determine client IP address.")
-            
-            cache_key = f"admin_login:{client_ip}"
-            failed_attempts = cache.get(cache_key, {'count': 0, 'first_attempt': None})
-            
-            # Reset counter if it's been more than 24 hours
-            if failed_attempts['first_attempt']:
-                first_attempt = failed_attempts['first_attempt']
-                if timezone.now() - first_attempt > timedelta(hours=24):
-                    failed_attempts = {'count': 0, 'first_attempt': None}
-            
-            if failed_attempts['count'] >= 5:  # Max 5 attempts
-                return HttpResponseForbidden("Too many login attempts. Please try again later.")
-            
-            # Update attempts only if it's a failed login
-            if 'username' in request.POST and not request.user.is_authenticated:
-                failed_attempts['count'] += 1
-                if not failed_attempts['first_attempt']:
-                    failed_attempts['first_attempt'] = timezone.now()
-                cache.set(cache_key, failed_attempts, 86400)  # 24 hours
-        
+
+        client_ip, _ = get_client_ip(request)
+        if not client_ip:
+            return HttpResponseForbidden("Cannot determine client IP address.")
+
+        identities = _identities(request, request.POST.get('username'))
+        keys = [_lock_key(identity) for identity in identities]
+        keys += [_failures_key(identity) for identity in identities]
+        state = cache.get_many(keys)
+
+        locked_until = max((state.get(_lock_key(identity), 0) for identity in identities), default=0)
+        if locked_until > time.time():
+            response = HttpResponse("Too many login attempts. Please try again later.", status=429)
+            response['Retry-After'] = str(max(math.ceil(locked_until - time.time()), 1))
+            return response
+
+        # Lets a successful login skip the reset when there is nothing to reset
+        request._login_failures_seen = _failures_key(identities[-1]) in state
         return view_func(request, *args, **kwargs)
     return wrapper
+
+
+# Kept for existing imports
+admin_brute_force_protect = brute_force_protect
+
+
+def _increment(key):
+    try:
+        failures = cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, FAILURE_WINDOW):
+            return 1
+        failures = cache.incr(key)
+    # incr keeps the expiry set by add, so restart the window on every failure
+    cache.touch(key, FAILURE_WINDOW)
+    return failures
+
+
+@receiver(user_login_failed)
+def login_failed(sender, credentials, request=None, **kwargs):
+    if request is None or not get_client_ip(request)[0]:
+        return
+    limit, base, maximum = _settings()
+    for identity in _identities(request, credentials.get('username')):
+        failures = _increment(_failures_key(identity))
+        if failures >= limit:
+            # Each failure past the limit doubles the lockout
+            lockout = min(base * 2 ** (failures - limit), maximum)
+            cache.set(_lock_key(identity), time.time() + lockout, lockout)
+
+
+@receiver(user_logged_in)
+def login_succeeded(sender, request=None, user=None, **kwargs):
+    # Only the username counter is reset: a valid account must not clear
+    # the failures of everything else tried from the same IP
+    if request is None or not getattr(request, '_login_failures_seen', False):
+        return
+    identities = _identities(request, request.POST.get('username'))
+    if len(identities) > 1:
+        cache.delete(_failures_key(identities[-1]))
@@ -0,0 +1,83 @@
+import random
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Certificate, Course, Student
+from .search import build_search_document
+from .verification import register_certificate_ids
+
+FIRST_NAMES = ('Ahmed', 'Mona', 'Omar', 'Sara', 'Youssef', 'Nour', 'Karim', 'Laila', 'Hassan', 'Salma')
+LAST_NAMES = ('Hassan', 'Ali', 'Ibrahim', 'Mahmoud', 'Khalil', 'Farouk', 'Saleh', 'Nasser', 'Adel', 'Fathy')
+GRADES = ('A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', None)
+
+
+def seed_dataset(students=200, courses=10, certificates_per_student=3, seed=0, batch_size=1000,
+                 password='password', on_batch=None):
+    """Fill the database with synthetic students, courses and certificates.
+
+    Rows are bulk-inserted batch_size students at a time, and the same
+    seed on the same database always produces the same data. Numbering
+    continues after students seeded earlier, so it can be run repeatedly.
+    Every student gets the same password, hashed once. on_batch, if
+    given, is called with the running totals of students and
+    certificates after each batch. Returns the created courses.
+    """
+    first_student = User.objects.filter(username__regex=r'^student[0-9]+@example\.com$').count()
+    first_course = Course.objects.count()
+    # Mix the offset in, so a rerun with the same seed draws new certificate ids
+    rng = random.Random(f'{seed}:{first_student}')
+    password = make_password(password)
+    now = timezone.now()
+
+    course_objects = Course.objects.bulk_create([
+        Course(name=f'Course {number + 1}', description=f'Synthetic course {number + 1}',
+               duration=rng.choice((10, 20, 30, 40)))
+        for number in range(first_course, first_course + courses)
+    ])
+    certificates_per_student = min(certificates_per_student, courses)
+
+    certificates_created = 0
+    for start in range(first_student, first_student + students, batch_size):
+        numbers = range(start, min(start + batch_size, first_student + students))
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(
+                    username=f'student{number}@example.com',
+                    email=f'student{number}@example.com',
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    password=password,
+                )
+                for number in numbers
+            ])
+            student_objects = Student.objects.bulk_create([
+                Student(user=user, phone=f'+2010{number:08d}', require_password_change=False)
+                for number, user in zip(numbers, users)
+            ])
+            certificates = []
+            for student in student_objects:
+                for course in rng.sample(course_objects, certificates_per_student):
+                    start_date = now - timedelta(days=rng.randint(30, 730))
+                    certificate = Certificate(
+                        certificate_id=uuid.UUID(int=rng.getrandbits(128), version=4),
+                        student=student,
+                        course=course,
+                        start_date=start_date,
+                        end_date=start_date + timedelta(days=rng.randint(7, 90)),
+                        grade=rng.choice(GRADES),
+                        is_valid=rng.random() > 0.05,
+                    )
+                    # bulk_create skips the pre_save signal that normally fills this
+                    certificate.search_document = build_search_document(certificate)
+                    certificates.append(certificate)
+            Certificate.objects.bulk_create(certificates)
+        register_certificate_ids(certificate.certificate_id for certificate in certificates)
+        certificates_created += len(certificates)
+        if on_batch is not None:
+            on_batch(numbers.stop - first_student, certificates_created)
+    return course_objects
@@ -0,0 +1,110 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Certificate, Course, Job, Student, get_job_storage
+from .pdf_cache import invalidate_certificate_pdfs
+from .search import build_search_document, refresh_search_documents
+from .verification import invalidate_verification_records, register_certificate_ids
+
+def certificates_changed(certificate_ids):
+    """Drop everything cached about the given certificates once the change commits"""
+    certificate_ids = list(certificate_ids)
+
+    def invalidate():
+        invalidate_verification_records(certificate_ids)
+        invalidate_certificate_pdfs(certificate_ids)
+    # Invalidating earlier would let another worker re-cache the uncommitted old state
+    transaction.on_commit(invalidate)
+
+
+@receiver(pre_save, sender=Certificate)
+def update_search_document(sender, instance, **kwargs):
+    instance.search_document = build_search_document(instance)
+
+
+@receiver(post_save, sender=Certificate)
+@receiver(post_delete, sender=Certificate)
+def certificate_changed(sender, instance, created=False, **kwargs):
+    if created:
+        certificate_id = instance.certificate_id
+        # Other workers must be able to see the row when they rebuild their id filter
+        transaction.on_commit(lambda: register_certificate_ids([certificate_id]))
+    certificates_changed([instance.certificate_id])
+
+
+# Fields of related rows that appear on a rendered, verified or searched
+# certificate; saves leaving them alone don't touch the certificates
+RENDERED_FIELDS = {
+    User: ('first_name', 'last_name', 'email'),
+    Student: ('user',),
+    Course: ('name', 'duration'),
+}
+
+
+def refresh_certificates(certificates):
+    """Rebuild search documents and drop caches of certificates whose related rows changed.
+
+    Sets larger than the job background threshold go to the job queue, so
+    a course rename doesn't rewrite thousands of rows in the request.
+    """
+    from .jobs import background_threshold, enqueue_job
+
+    certificate_pks = list(certificates.values_list('pk', flat=True))
+    if len(certificate_pks) > background_threshold():
+        enqueue_job('refresh_certificates', certificate_pks=certificate_pks)
+        return
+    refresh_search_documents(certificates)
+    certificates_changed(certificates.values_list('certificate_id', flat=True))
+
+
+def _attnames(sender):
+    return [sender._meta.get_field(field).attname for field in RENDERED_FIELDS[sender]]
+
+
+def _skips_rendered_fields(sender, update_fields):
+    # Logins save last_login only and must not even be compared
+    return update_fields is not None and {*RENDERED_FIELDS[sender], *_attnames(sender)}.isdisjoint(update_fields)
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Student)
+@receiver(pre_save, sender=Course)
+def remember_rendered_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._rendered_before = None
+    if raw or instance._state.adding or _skips_rendered_fields(sender, update_fields):
+        return
+    instance._rendered_before = sender.objects.filter(pk=instance.pk).values_list(*_attnames(sender)).first()
+
+
+def _rendered_fields_changed(sender, instance):
+    before = getattr(instance, '_rendered_before', None)
+    return before is not None and before != tuple(getattr(instance, attname) for attname in _attnames(sender))
+
+
+@receiver(post_save, sender=Student)
+def student_changed(sender, instance, created, **kwargs):
+    if not created and _rendered_fields_changed(sender, instance):
+        refresh_certificates(Certificate.objects.filter(student=instance))
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    if not created and _rendered_fields_changed(sender, instance):
+        refresh_certificates(Certificate.objects.filter(student__user=instance))
+
+
+@receiver(post_save, sender=Course)
+def course_changed(sender, instance, created, **kwargs):
+    if not created and _rendered_fields_changed(sender, instance):
+        refresh_certificates(Certificate.objects.filter(course=instance))
+
+
+@receiver(post_delete, sender=Job)
+def job_deleted(sender, instance, **kwargs):
+    if instance.result_file:
+        instance.result_file.delete(save=False)
+    if instance.kind == 'import_roster':
+        # An upload that was never imported
+        get_job_storage().delete(instance.arguments['roster'])
@@ -1,3 +1,537 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin import site
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.utils import timezone
+from reportlab.pdfgen import canvas
+
+from certifier import urls as certifier_urls
+from certifier.settings.base import MIDDLEWARE
+
+from . import ratelimit, views
+from .benchmarks import run_suite
+from .credentials import PARALLEL_HASH_MIN, PasswordHasherPool
+from .jobs import claim_job, enqueue_job, expire_job_results
+from .loadtest import LoadTest, LoadTestData, parse_mix
+from .middleware import RequestMetricsMiddleware
+from .models import Certificate, Course, Job, Student
+from .pdf_cache import certificate_fingerprint
+from .rendering import CertificateTemplate, get_certificate_template
+from .security import FAILURE_WINDOW
+from .seeding import seed_dataset
+from .verification import (
+    ID_FILTER_VERSION_KEY, _publish_id_filter_batch, get_verification_cache, get_verification_record,
+)
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            'student@example.com', 'student@example.com', 'password',
+            first_name='Test', last_name='Student'
+        )
+        self.student = Student.objects.create(user=self.user, phone='0100000000', require_password_change=False)
+        self.client.force_login(self.user, backend='certificates.backends.StudentModelBackend')
+
+    def create_certificates(self, count):
+        for i in range(count):
+            course = Course.objects.create(name=f'Course {i}', description='Description', duration=10)
+            Certificate.objects.create(student=self.student, course=course)
+
+    def count_dashboard_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('certificates:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_dashboard_query_count(self):
+        self.create_certificates(5)
+        # Session, user joined with its student, certificates joined with their courses
+        self.assertEqual(self.count_dashboard_queries(), 3)
+
+    def test_query_count_does_not_depend_on_certificate_count(self):
+        self.create_certificates(1)
+        baseline = self.count_dashboard_queries()
+        self.create_certificates(10)
+        self.assertEqual(self.count_dashboard_queries(), baseline)
+
+    def test_password_change_required_redirects(self):
+        self.student.require_password_change = True
+        self.student.save()
+        response = self.client.get(reverse('certificates:dashboard'))
+        self.assertRedirects(response, reverse('certificates:password_change'))
+
+    @override_settings(DASHBOARD_PAGE_SIZE=3)
+    def test_keyset_pagination_walks_all_certificates(self):
+        self.create_certificates(7)
+        seen = []
+        url = reverse('certificates:dashboard')
+        while url:
+            response = self.client.get(url)
+            seen.extend(c.certificate_id for c in response.context['certificates'])
+            cursor = response.context['next_cursor']
+            url = f"{reverse('certificates:dashboard')}?after={cursor}" if cursor else None
+        expected = list(
+            Certificate.objects.order_by('-issue_date', '-pk').values_list('certificate_id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+
+class RenderingTests(SimpleTestCase):
+    # draw_background relies on ReportLab internals; check them before upgrading the pin
+    def test_background_reportlab_internals(self):
+        template = get_certificate_template()
+        for _ in range(2):
+            buffer = BytesIO()
+            c = canvas.Canvas(buffer, pagesize=(template.width, template.height), pageCompression=0)
+            for owner, attribute in [(c, '_doc'), (c, '_code'), (c, '_formsinuse'), (c, '_currentPageHasImages'),
+                                     (c._doc, 'idToObject'), (c._doc, 'getXObjectName'), (c._doc, 'addForm')]:
+                self.assertTrue(hasattr(owner, attribute), f'ReportLab no longer has {type(owner).__name__}.{attribute}')
+            template.draw_background(c)
+            reg_name = c._doc.getXObjectName(template.xobject_name)
+            c.showPage()
+            c.save()
+            pdf = buffer.getvalue()
+            # Embedded once, listed in the page resources and drawn
+            self.assertEqual(pdf.count(b'/Subtype /Image'), 1)
+            self.assertIn(f'/{reg_name} '.encode(), pdf.split(b'/XObject', 1)[1])
+            self.assertIn(f'/{reg_name} Do'.encode(), pdf)
+
+    def test_template_identity_ignores_file_times(self):
+        # Fresh checkouts and other boxes get new mtimes but must share cached renders
+        template = get_certificate_template()
+        with tempfile.TemporaryDirectory() as directory:
+            path = shutil.copy(template.path, directory)
+            os.utime(path, (0, 0))
+            copied = CertificateTemplate(path)
+        self.assertEqual((copied.digest, copied.xobject_name), (template.digest, template.xobject_name))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'login-tests'}},
+    LOGIN_FAILURE_LIMIT=3, LOGIN_LOCKOUT_BASE=60, LOGIN_LOCKOUT_MAX=200,
+)
+class LoginProtectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('student@example.com', 'student@example.com', 'password')
+        self.now = time.time()
+        clock = mock.patch('time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def login(self, username='student@example.com', password='wrong', ip='10.0.0.1'):
+        return self.client.post(reverse('login'), {'username': username, 'password': password}, REMOTE_ADDR=ip)
+
+    def test_lockout_doubles_up_to_the_maximum(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 200)
+        for lockout in (60, 120, 200):
+            response = self.login(password='password')
+            self.assertEqual((response.status_code, response['Retry-After']), (429, str(lockout)))
+            self.now += lockout + 1
+            self.assertEqual(self.login().status_code, 200)
+
+    def test_username_is_locked_across_ips(self):
+        for _ in range(3):
+            self.login()
+        self.assertEqual(self.login(password='password', ip='10.0.0.2').status_code, 429)
+        self.assertEqual(self.login(username='other@example.com', ip='10.0.0.2').status_code, 200)
+
+    def test_successful_login_resets_the_username(self):
+        for _ in range(2):
+            self.login()
+        self.assertEqual(self.login(password='password').status_code, 302)
+        for _ in range(2):
+            self.login(ip='10.0.0.2')
+        self.assertEqual(self.login(password='password', ip='10.0.0.2').status_code, 302)
+
+    def test_each_failure_restarts_the_window(self):
+        self.login()
+        self.now += FAILURE_WINDOW - 60 * 60
+        self.login()
+        # Two hours past the first failure's window, the count is still kept
+        self.now += 2 * 60 * 60
+        self.login()
+        self.assertEqual(self.login(password='password').status_code, 429)
+
+
+class ViewCertificateTests(TestCase):
+    def test_if_modified_since_revalidation(self):
+        user = User.objects.create_user('student@example.com', 'student@example.com', 'password')
+        student = Student.objects.create(user=user, phone='0100000000', require_password_change=False)
+        course = Course.objects.create(name='Python', description='Description', duration=10)
+        certificate = Certificate.objects.create(student=student, course=course)
+        self.client.force_login(user, backend='certificates.backends.StudentModelBackend')
+        url = reverse('certificates:view_certificate', args=[certificate.certificate_id])
+        with tempfile.TemporaryDirectory() as pdf_dir, self.settings(CERTIFICATE_PDF_CACHE_OPTIONS={'location': pdf_dir}):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get(url, headers={'If-Modified-Since': response['Last-Modified']})
+            self.assertEqual(response.status_code, 304)
+            # Renders are renamed into place, leaving no partial files behind
+            self.assertEqual(os.listdir(os.path.join(pdf_dir, str(certificate.certificate_id))),
+                             [f'{certificate_fingerprint(certificate)}.pdf'])
+
+
+@override_settings(CERTIFICATE_ID_FILTER_ENABLED=True)
+class VerificationTests(TestCase):
+    def test_new_certificate_is_registered_on_commit(self):
+        user = User.objects.create_user('student@example.com', 'student@example.com', 'password')
+        student = Student.objects.create(user=user, phone='0100000000')
+        course = Course.objects.create(name='Python', description='Description', duration=10)
+        verification_cache = get_verification_cache()
+        version = verification_cache.get(ID_FILTER_VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            certificate = Certificate.objects.create(student=student, course=course)
+            # Other workers could not see the row yet
+            self.assertEqual(verification_cache.get(ID_FILTER_VERSION_KEY), version)
+        self.assertTrue(callbacks)
+        self.assertNotEqual(verification_cache.get(ID_FILTER_VERSION_KEY), version)
+        self.assertIsNotNone(get_verification_record(certificate.certificate_id))
+
+    def test_filters_catch_up_without_rescanning(self):
+        verification_cache = get_verification_cache()
+        # Start the version counter, then build this process's filter
+        _publish_id_filter_batch(verification_cache, [])
+        get_verification_record(uuid.uuid4())
+        certificate_id = uuid.uuid4()
+        # As another process registering a certificate would
+        _publish_id_filter_batch(verification_cache, [certificate_id])
+        verification_cache.clear_local()
+        with CaptureQueriesContext(connection) as queries:
+            get_verification_record(certificate_id)
+        # Only the record lookup the filter let through, no scan of every id
+        certificate_queries = [query for query in queries if 'certificates_certificate' in query['sql']]
+        self.assertEqual(len(certificate_queries), 1)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        python = Course.objects.create(name='Python', description='Description', duration=10)
+        django = Course.objects.create(name='Django 1', description='Description', duration=10)
+        self.certificates = {}
+        for number, (course, grade) in enumerate([(python, 'A-'), (python, 'A'), (django, 'B+')]):
+            user = User.objects.create_user(f'student{number}@example.com', f'student{number}@example.com', 'password',
+                                            first_name='Amal', last_name=f'Test{number}')
+            student = Student.objects.create(user=user, phone=f'010000000{number}')
+            self.certificates[number] = Certificate.objects.create(student=student, course=course, grade=grade)
+
+    def search(self, term):
+        results, _ = site._registry[Certificate].get_search_results(None, Certificate.objects.all(), term)
+        return sorted(number for number, certificate in self.certificates.items() if certificate in results)
+
+    def test_words_match_document_prefixes(self):
+        self.assertEqual(self.search('django 1'), [2])
+        self.assertEqual(self.search('amal test0'), [0])
+        self.assertEqual(self.search('A-'), [0])
+        self.assertEqual(self.search('B+'), [2])
+
+    def test_certificate_ids(self):
+        certificate_id = str(self.certificates[1].certificate_id)
+        self.assertEqual(self.search(certificate_id), [1])
+        # Hex fragments of ids don't leak into word searches
+        self.assertNotIn(certificate_id.split('-')[1], Certificate.objects.get(pk=self.certificates[1].pk).search_document)
+
+    def test_substrings_fall_back_to_scanning(self):
+        self.assertEqual(self.search('dent1'), [1])
+        self.assertEqual(self.search(str(self.certificates[2].certificate_id)[4:12]), [2])
+
+
+    def test_only_rendered_changes_refresh_certificates(self):
+        course = self.certificates[2].course
+        course.description = 'Changed'
+        with CaptureQueriesContext(connection) as queries:
+            course.save()
+        # Reading the stored values, then the update itself
+        self.assertEqual(len(queries), 2)
+        course.name = 'Flask'
+        course.save()
+        self.assertIn('Flask', Certificate.objects.get(pk=self.certificates[2].pk).search_document)
+        user = self.certificates[0].student.user
+        user.last_name = 'Renamed'
+        user.save()
+        self.assertEqual(self.search('renamed'), [0])
+
+    @override_settings(JOB_BACKGROUND_THRESHOLD=1)
+    def test_large_refreshes_are_queued(self):
+        course = self.certificates[0].course
+        course.name = 'Flask'
+        course.save()
+        self.assertEqual(Job.objects.get().kind, 'refresh_certificates')
+        self.assertFalse(Certificate.objects.filter(search_document__contains='Flask').exists())
+        call_command('run_worker', '--once', stdout=StringIO())
+        self.assertEqual(Certificate.objects.filter(search_document__contains='Flask').count(), 2)
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        user = User.objects.create_user('student@example.com', 'student@example.com', 'password')
+        student = Student.objects.create(user=user, phone='0100000000')
+        course = Course.objects.create(name='Course', description='Description', duration=10)
+        self.certificates = [Certificate.objects.create(student=student, course=course) for _ in range(3)]
+
+    def test_job_is_claimed_once(self):
+        job = enqueue_job('set_certificate_validity', certificate_pks=[], is_valid=False)
+        self.assertEqual(claim_job('first').pk, job.pk)
+        self.assertIsNone(claim_job('second'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (Job.RUNNING, 'first'))
+
+    def test_worker_runs_queued_jobs(self):
+        job = enqueue_job(
+            'set_certificate_validity',
+            certificate_pks=[certificate.pk for certificate in self.certificates], is_valid=False
+        )
+        call_command('run_worker', '--once', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual((job.progress, job.total), (3, 3))
+        self.assertFalse(Certificate.objects.filter(is_valid=True).exists())
+
+    def test_failed_job_records_error(self):
+        job = enqueue_job('set_certificate_validity', certificate_pks=[])
+        with self.assertLogs('certificates.jobs', 'ERROR'):
+            call_command('run_worker', '--once', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('KeyError', job.message)
+
+    def test_requeue_skips_live_jobs(self):
+        now = timezone.now()
+        failed = Job.objects.create(kind='reset_passwords', status=Job.FAILED)
+        live = Job.objects.create(kind='reset_passwords', status=Job.RUNNING, started_at=now)
+        stale = Job.objects.create(kind='reset_passwords', status=Job.RUNNING, started_at=now - timedelta(days=1))
+        done = Job.objects.create(kind='reset_passwords', status=Job.DONE)
+        self.client.force_login(self.admin)
+        self.client.post(reverse('admin:certificates_job_changelist'), {
+            'action': 'requeue_jobs', '_selected_action': [failed.pk, live.pk, stale.pk, done.pk],
+        })
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[job.pk] for job in (failed, live, stale, done)],
+            [Job.QUEUED, Job.RUNNING, Job.QUEUED, Job.DONE]
+        )
+
+    def test_password_results_are_downloaded_once(self):
+        job_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(job_dir.cleanup)
+        student = Student.objects.get()
+        job = enqueue_job('reset_passwords', created_by=self.admin, student_pks=[student.pk])
+        self.client.force_login(self.admin)
+        url = reverse('admin:certificates_job_download', args=[job.pk])
+        with self.settings(JOB_RESULT_OPTIONS={'location': job_dir.name}):
+            call_command('run_worker', '--once', stdout=StringIO())
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'student@example.com', response.content)
+            self.assertEqual(self.client.get(url).status_code, 404)
+        job.refresh_from_db()
+        self.assertFalse(job.result_file)
+
+    def test_old_results_expire(self):
+        job_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(job_dir.cleanup)
+        with self.settings(JOB_RESULT_OPTIONS={'location': job_dir.name}, JOB_RESULT_TTL=60):
+            recent = Job.objects.create(kind='export_certificates', status=Job.DONE, finished_at=timezone.now())
+            old = Job.objects.create(kind='export_certificates', status=Job.DONE,
+                                     finished_at=timezone.now() - timedelta(minutes=2))
+            for job in (recent, old):
+                job.result_file.save('result.zip', ContentFile(b'zip'))
+            self.assertEqual(expire_job_results(), 1)
+            old.refresh_from_db()
+            self.assertFalse(old.result_file)
+            self.assertTrue(recent.result_file.storage.exists(recent.result_file.name))
+
+    def test_passwords_are_hashed_across_processes(self):
+        passwords = [f'password{number}' for number in range(PARALLEL_HASH_MIN)]
+        with PasswordHasherPool(workers=2) as hasher:
+            hashes = hasher.hash(passwords)
+            self.assertIsNotNone(hasher._executor)
+        self.assertTrue(all(check_password(password, hashed) for password, hashed in zip(passwords, hashes)))
+
+    @override_settings(JOB_BACKGROUND_THRESHOLD=1)
+    def test_large_roster_import_is_queued(self):
+        job_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(job_dir.cleanup)
+        self.client.force_login(self.admin)
+        roster = SimpleUploadedFile('roster.csv', (
+            b'email,first_name,last_name,phone,course\n'
+            b'one@example.com,One,Student,0100000001,Course\n'
+            b'two@example.com,Two,Student,0100000002,Missing\n'
+        ))
+        with self.settings(JOB_RESULT_OPTIONS={'location': job_dir.name}):
+            response = self.client.post(reverse('admin:certificates_student_import'), {'roster': roster})
+            self.assertRedirects(response, reverse('admin:certificates_student_changelist'))
+            self.assertFalse(User.objects.filter(email='one@example.com').exists())
+            call_command('run_worker', '--once', stdout=StringIO())
+            job = Job.objects.get()
+            self.assertEqual((job.kind, job.status, job.progress), ('import_roster', Job.DONE, 2))
+            self.assertTrue(Certificate.objects.filter(student__user__email='one@example.com').exists())
+            with job.result_file.open('rb') as errors:
+                self.assertIn(b'Unknown course: Missing', errors.read())
+            # Only the error report is left
+            self.assertEqual(os.listdir(os.path.join(job_dir.name, 'rosters')), [])
+
+    @override_settings(JOB_BACKGROUND_THRESHOLD=2)
+    def test_large_admin_action_is_queued(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin:certificates_certificate_changelist'), {
+            'action': 'invalidate_certificates',
+            '_selected_action': [certificate.pk for certificate in self.certificates],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Certificate.objects.filter(is_valid=True).count(), 3)
+        job = Job.objects.get()
+        self.assertEqual((job.kind, job.created_by), ('set_certificate_validity', self.admin))
+
+
+class MetricsTests(TestCase):
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('certificates:verify'), {'certificate_id': str(uuid.uuid4())})
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('cache;desc="0 hits, 1 misses"', response['Server-Timing'])
+
+    def test_metrics_endpoint_is_staff_only(self):
+        url = reverse('certificates:metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with self.settings(METRICS_TOKEN='secret'):
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'certifier_request_duration_seconds_bucket{view="certificates:metrics"', response.content)
+
+
+class AsyncViewTests(TestCase):
+    # The async views are only routed under ASGI, so call them directly
+    def setUp(self):
+        self.user = User.objects.create_user('student@example.com', 'student@example.com', 'password')
+        student = Student.objects.create(user=self.user, phone='0100000000', require_password_change=False)
+        course = Course.objects.create(name='Python', description='Description', duration=10)
+        self.certificate = Certificate.objects.create(student=student, course=course)
+        pdf_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(pdf_dir.cleanup)
+        settings = self.settings(CERTIFICATE_PDF_CACHE_OPTIONS={'location': pdf_dir.name})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def make_request(self, path, user=None, **headers):
+        request = AsyncRequestFactory().get(path, headers=headers)
+        request.user = user or AnonymousUser()
+
+        async def auser():
+            return request.user
+        request.auser = auser
+        return request
+
+    async def test_verify(self):
+        request = self.make_request(f'/certificates/verify/?certificate_id={self.certificate.certificate_id}')
+        response = await views.averify(request)
+        self.assertContains(response, 'This is a valid certificate')
+
+    async def test_view_certificate(self):
+        certificate_id = str(self.certificate.certificate_id)
+        response = await views.aview_certificate(self.make_request('/'), certificate_id)
+        self.assertEqual(response.status_code, 302)
+
+        response = await views.aview_certificate(self.make_request('/', self.user), certificate_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        request = self.make_request('/', self.user, if_none_match=response['ETag'])
+        self.assertEqual((await views.aview_certificate(request, certificate_id)).status_code, 304)
+
+        other = await User.objects.acreate_user('other@example.com', 'other@example.com', 'password')
+        response = await views.aview_certificate(self.make_request('/', other), certificate_id)
+        self.assertEqual(response.status_code, 403)
+
+
+class AsyncURLConf:
+    """certifier.urls as routed under ASGI, where ASYNC_VIEWS is set"""
+    urlpatterns = [
+        path('certificates/view/<str:certificate_id>/', views.aview_certificate),
+        path('certificates/verify/', views.averify),
+        *certifier_urls.urlpatterns,
+    ]
+
+
+@override_settings(
+    ROOT_URLCONF=AsyncURLConf,
+    MIDDLEWARE=['whitenoise.middleware.WhiteNoiseMiddleware',
+                *(middleware for middleware in MIDDLEWARE if 'WhiteNoise' not in middleware)],
+    RATE_LIMITS={'verify': '1/m'},
+)
+class AsyncStackTests(TestCase):
+    # Through the full middleware stack, ordered as under ASGI
+    def setUp(self):
+        # Rate limit counters outlive other tests in a local-memory cache
+        cache.clear()
+        ratelimit._closed_windows.clear()
+
+    async def test_verify(self):
+        with mock.patch.object(RequestMetricsMiddleware, '__acall__', autospec=True,
+                               side_effect=RequestMetricsMiddleware.__acall__) as acall:
+            response = await self.async_client.get('/certificates/verify/', {'certificate_id': str(uuid.uuid4())})
+        acall.assert_awaited_once()
+        self.assertContains(response, 'could not be found in our system')
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+        response = await self.async_client.get('/certificates/verify/')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+
+class BenchmarkTests(TestCase):
+    def test_suite_runs_on_seeded_data(self):
+        seed_dataset(students=5, courses=3, certificates_per_student=2)
+        self.assertEqual(Certificate.objects.count(), 10)
+        report = run_suite(iterations=2, warmup=0)
+        stats = {benchmark['name']: benchmark['stats'] for benchmark in report['benchmarks']}
+        self.assertIn('admin_certificate_changelist', stats)
+        # A cached verification never reaches the database
+        self.assertEqual(stats['verify']['queries'], 0)
+        self.assertEqual(stats['verify_uncached']['queries'], 1)
+        # The admin benchmarks sign in with a throwaway account
+        self.assertFalse(User.objects.filter(is_staff=True).exists())
+
+    def test_seeding_again_continues_numbering(self):
+        out = StringIO()
+        call_command('seed_certifier', students=3, courses=2, certs_per_student=2, stdout=out)
+        call_command('seed_certifier', students=2, courses=2, certs_per_student=1, stdout=out)
+        self.assertEqual(Student.objects.count(), 5)
+        self.assertEqual(Certificate.objects.count(), 8)
+        self.assertTrue(User.objects.filter(username='student4@example.com').exists())
+        self.assertFalse(Certificate.objects.filter(search_document='').exists())
+
+
+@override_settings(RATE_LIMITS_ENABLED=False)
+class LoadTestTests(TransactionTestCase):
+    # The load test threads use their own connections, which cannot see a test transaction
+    def test_mix_runs_in_process(self):
+        seed_dataset(students=5, courses=3, certificates_per_student=2)
+        load_test = LoadTest(parse_mix('verify=3,dashboard=1,admin_search=1'), LoadTestData(), concurrency=1, max_requests=20)
+        summary = load_test.run()
+        self.assertEqual(summary['requests'], 20)
+        self.assertEqual(summary['errors'], [])
+        self.assertEqual(summary['scenarios']['admin_search']['failed'], 0)
+        self.assertFalse(User.objects.filter(is_staff=True).exists())
+        self.assertTrue(all(stats['failed'] == 0 for stats in summary['scenarios'].values()))
+
+    def test_unknown_scenario_is_rejected(self):
+        with self.assertRaises(ValueError):
+            parse_mix('verify=1,nope=2')
@@ -1,13 +1,22 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'certificates'
 
+# Under WSGI every async view would need its own event loop, so they are opt-in
+if getattr(settings, 'ASYNC_VIEWS', False):
+    view_certificate, verify = views.aview_certificate, views.averify
+else:
+    view_certificate, verify = views.view_certificate, views.verify
+
 urlpatterns = [
     path('password_change/', views.password_change, name='password_change'),
     path('', views.home, name='home'),
     path('courses/', views.course_list, name='course_list'),
     path('dashboard/', views.dashboard, name='dashboard'),
-    path('view/<str:certificate_id>/', views.view_certificate, name='view_certificate'),
-    path('verify/', views.verify, name='verify'),
+    path('view/<str:certificate_id>/', view_certificate, name='view_certificate'),
+    path('verify/', verify, name='verify'),
+    path('api/verify/', views.api_verify, name='api_verify'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
@@ -0,0 +1,324 @@
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .bloom import BloomFilter
+from .metrics import record_cache
+from .models import Certificate
+
+VERIFICATION_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Verification reads go through the two-tier cache when it is configured
+VERIFICATION_CACHE_ALIAS = 'verification'
+
+# Unknown ids are remembered briefly so repeated lookups skip the database
+NEGATIVE_CACHE_TIMEOUT = 60 * 5
+_NOT_FOUND = 'not_found'
+
+# Counts batches of created certificates; each batch's ids are published under
+# an additions key so other processes extend their filter instead of rebuilding
+ID_FILTER_VERSION_KEY = 'verify:id_filter_version'
+# Changes when the counter starts over (e.g. evicted), so old filters rebuild
+ID_FILTER_EPOCH_KEY = 'verify:id_filter_epoch'
+ID_FILTER_KEYS = [ID_FILTER_VERSION_KEY, ID_FILTER_EPOCH_KEY]
+# Processes further behind than this many batches rebuild instead
+ID_FILTER_MAX_CATCH_UP = 1000
+
+RECORD_FIELDS = (
+    'certificate_id', 'student_name', 'course_name', 'grade',
+    'issue_date', 'start_date', 'end_date', 'is_valid',
+)
+
+# Columns loaded for a record, in RECORD_FIELDS order with the name split in two
+_QUERY_FIELDS = (
+    'certificate_id', 'student__user__first_name', 'student__user__last_name', 'course__name',
+    'grade', 'issue_date', 'start_date', 'end_date', 'is_valid',
+)
+
+
+class VerificationRecord:
+    """What the public verify page shows about a certificate.
+
+    Small enough to live in the cache, and attribute-compatible with
+    Certificate for get_validity_message.
+    """
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, *values):
+        for field, value in zip(RECORD_FIELDS, values):
+            setattr(self, field, value)
+
+    @classmethod
+    def from_row(cls, row):
+        certificate_id, first_name, last_name, *rest = row
+        return cls(certificate_id, f"{first_name} {last_name}".strip(), *rest)
+
+    def to_tuple(self):
+        return tuple(getattr(self, field) for field in RECORD_FIELDS)
+
+
+def get_verification_cache():
+    if VERIFICATION_CACHE_ALIAS in settings.CACHES:
+        return caches[VERIFICATION_CACHE_ALIAS]
+    return caches['default']
+
+
+def verification_cache_key(certificate_id):
+    return f"verify:{certificate_id}"
+
+
+def _id_filter_additions_key(epoch, count):
+    return f"verify:id_filter_added:{epoch}:{count}"
+
+
+def _id_filter_refresh():
+    return getattr(settings, 'CERTIFICATE_ID_FILTER_REFRESH', 60 * 60)
+
+
+class _CertificateIdFilter:
+    """Per-process Bloom filter of every issued certificate_id.
+
+    Its version is the (epoch, count) of the last published batch of new
+    ids it includes. It is built with a full scan, then kept up to date
+    from the published batches; only a new epoch, falling too far behind
+    or CERTIFICATE_ID_FILTER_REFRESH passing cause another scan.
+    """
+
+    def __init__(self):
+        self.bloom = None
+        self.version = None
+        self.built_at = 0
+        self.lock = threading.Lock()
+        self.rebuild_lock = threading.Lock()
+
+    def is_current(self, version):
+        return (
+            self.bloom is not None
+            and self.version == version
+            and time.monotonic() - self.built_at < _id_filter_refresh()
+        )
+
+    def get(self, version):
+        """The filter for this id version, or None while it can't be trusted.
+
+        A filter a few batches behind catches up from the cache. Otherwise
+        one thread at a time rebuilds with a full scan, outside self.lock.
+        Meanwhile the others keep using a filter that is merely old, but
+        get None if certificates were added since, so they ask the database.
+        """
+        if self.is_current(version):
+            return self.bloom
+        caught_up = self.catch_up(version)
+        if caught_up is not False:
+            return self.bloom if caught_up else None
+        if not self.rebuild_lock.acquire(blocking=self.bloom is None):
+            return self.bloom if self.version == version else None
+        try:
+            if not self.is_current(version):
+                bloom = self.build()
+                with self.lock:
+                    # Batches published during the scan are applied by the next catch-up
+                    self.bloom, self.version, self.built_at = bloom, version, time.monotonic()
+        finally:
+            self.rebuild_lock.release()
+        return self.bloom
+
+    def catch_up(self, version):
+        """Add the batches published since this filter's version.
+
+        Returns True once current, None if a batch isn't readable yet (its
+        publisher hasn't stored it, or it was evicted), and False when only
+        a rebuild will do.
+        """
+        epoch, count = version
+        with self.lock:
+            if (
+                self.bloom is None or self.version is None or time.monotonic() - self.built_at >= _id_filter_refresh()
+                or self.version[0] != epoch or not 0 <= count - self.version[1] <= ID_FILTER_MAX_CATCH_UP
+            ):
+                return False
+            first = self.version[1] + 1
+            keys = [_id_filter_additions_key(epoch, number) for number in range(first, count + 1)]
+            additions = get_verification_cache().get_many(keys)
+            for number, key in enumerate(keys, first):
+                if key not in additions:
+                    return None
+                for certificate_id in additions[key]:
+                    self.bloom.add(certificate_id)
+                self.version = (epoch, number)
+            return True
+
+    def build(self):
+        ids = Certificate.objects.values_list('certificate_id', flat=True)
+        # Headroom for certificates added before the next rebuild
+        bloom = BloomFilter(int(ids.count() * 1.1) + 1000)
+        for certificate_id in ids.iterator(chunk_size=5000):
+            bloom.add(certificate_id.bytes)
+        return bloom
+
+
+_id_filter = _CertificateIdFilter()
+
+
+def id_filter_enabled():
+    return getattr(settings, 'CERTIFICATE_ID_FILTER_ENABLED', False)
+
+
+def id_filter_version(cached):
+    """The id filter version from a get_many() of ID_FILTER_KEYS"""
+    return cached.get(ID_FILTER_EPOCH_KEY), cached.get(ID_FILTER_VERSION_KEY, 0)
+
+
+def _publish_id_filter_batch(verification_cache, certificate_ids):
+    """Count a new batch of ids, store it for other processes and return its version"""
+    try:
+        count = verification_cache.incr(ID_FILTER_VERSION_KEY)
+    except ValueError:
+        # First batch, or the counter was evicted: a new epoch makes every filter rebuild
+        verification_cache.set(ID_FILTER_EPOCH_KEY, uuid.uuid4().hex, None)
+        count = 1 if verification_cache.add(ID_FILTER_VERSION_KEY, 1, None) else verification_cache.incr(ID_FILTER_VERSION_KEY)
+    epoch = verification_cache.get(ID_FILTER_EPOCH_KEY)
+    # Kept a while past the refresh interval, after which every filter has rebuilt
+    verification_cache.set(
+        _id_filter_additions_key(epoch, count),
+        [certificate_id.bytes for certificate_id in certificate_ids],
+        _id_filter_refresh() * 2,
+    )
+    return epoch, count
+
+
+def register_certificate_ids(certificate_ids):
+    """Record newly created certificates in the id filter.
+
+    Call it once the creating transaction has committed, so other
+    workers rebuilding their filter can see the rows; post_save defers
+    it with on_commit and bulk_create paths call it after their atomic
+    block. Otherwise the new ids read as unknown until the next periodic
+    rebuild.
+    """
+    if not id_filter_enabled():
+        return
+    certificate_ids = list(certificate_ids)
+    verification_cache = get_verification_cache()
+    epoch, count = _publish_id_filter_batch(verification_cache, certificate_ids)
+    with _id_filter.lock:
+        if _id_filter.bloom is not None and _id_filter.version == (epoch, count - 1):
+            for certificate_id in certificate_ids:
+                _id_filter.bloom.add(certificate_id.bytes)
+            _id_filter.version = (epoch, count)
+    # Known ids may have been cached as misses before they existed
+    invalidate_verification_records(certificate_ids)
+
+
+# Steps shared by the sync and async single-record lookups
+
+def _lookup_keys(certificate_id):
+    """The record's cache key, and every key to fetch with it"""
+    cache_key = verification_cache_key(certificate_id)
+    return cache_key, [cache_key, *ID_FILTER_KEYS] if id_filter_enabled() else [cache_key]
+
+
+def _count_lookup(cached, cache_key):
+    """Count a verification cache lookup and return whether it hit"""
+    hit = cache_key in cached
+    record_cache('verification', hits=int(hit), misses=int(not hit))
+    return hit
+
+
+def _from_cache(value):
+    return None if value == _NOT_FOUND else VerificationRecord(*value)
+
+
+def _ruled_out(bloom, certificate_id):
+    # Definite misses are answered without touching the database
+    return bloom is not None and not bloom.might_contain(certificate_id.bytes)
+
+
+def _record_row(certificate_id):
+    return Certificate.objects.filter(certificate_id=certificate_id).values_list(*_QUERY_FIELDS)
+
+
+def _to_cache(row):
+    """The record for a loaded row (None if missing), with the value and timeout to cache"""
+    if row is None:
+        return None, _NOT_FOUND, NEGATIVE_CACHE_TIMEOUT
+    record = VerificationRecord.from_row(row)
+    return record, record.to_tuple(), VERIFICATION_CACHE_TIMEOUT
+
+
+def get_verification_record(certificate_id):
+    """Return the VerificationRecord for a certificate UUID, or None if it doesn't exist"""
+    verification_cache = get_verification_cache()
+    cache_key, keys = _lookup_keys(certificate_id)
+    cached = verification_cache.get_many(keys)
+    if _count_lookup(cached, cache_key):
+        return _from_cache(cached[cache_key])
+    if ID_FILTER_VERSION_KEY in keys and _ruled_out(_id_filter.get(id_filter_version(cached)), certificate_id):
+        return None
+    record, value, timeout = _to_cache(_record_row(certificate_id).first())
+    verification_cache.set(cache_key, value, timeout)
+    return record
+
+
+async def aget_verification_record(certificate_id):
+    """Async get_verification_record, for async views"""
+    verification_cache = get_verification_cache()
+    cache_key, keys = _lookup_keys(certificate_id)
+    cached = await verification_cache.aget_many(keys)
+    if _count_lookup(cached, cache_key):
+        return _from_cache(cached[cache_key])
+    if ID_FILTER_VERSION_KEY in keys:
+        version = id_filter_version(cached)
+        # Catching up reads the cache and rebuilding reads every id, so neither runs on the event loop
+        bloom = _id_filter.bloom if _id_filter.is_current(version) else await sync_to_async(_id_filter.get)(version)
+        if _ruled_out(bloom, certificate_id):
+            return None
+    record, value, timeout = _to_cache(await _record_row(certificate_id).afirst())
+    await verification_cache.aset(cache_key, value, timeout)
+    return record
+
+
+def get_verification_records(certificate_ids):
+    """Resolve many certificate UUIDs at once.
+
+    Returns a dict mapping each UUID to its VerificationRecord or None.
+    Cache misses are loaded with a single joined query.
+    """
+    verification_cache = get_verification_cache()
+    certificate_ids = list(dict.fromkeys(certificate_ids))
+    keys = {verification_cache_key(certificate_id): certificate_id for certificate_id in certificate_ids}
+    cached = verification_cache.get_many(keys)
+    records = {}
+    for key, value in cached.items():
+        records[keys[key]] = _from_cache(value)
+
+    missing = [certificate_id for certificate_id in certificate_ids if certificate_id not in records]
+    record_cache('verification', hits=len(records), misses=len(missing))
+    if missing:
+        rows = Certificate.objects.filter(certificate_id__in=missing).values_list(*_QUERY_FIELDS)
+        found = {}
+        for row in rows:
+            record = VerificationRecord.from_row(row)
+            records[record.certificate_id] = found[verification_cache_key(record.certificate_id)] = record
+        verification_cache.set_many(
+            {key: record.to_tuple() for key, record in found.items()},
+            VERIFICATION_CACHE_TIMEOUT
+        )
+        not_found = [certificate_id for certificate_id in missing if certificate_id not in records]
+        verification_cache.set_many(
+            {verification_cache_key(certificate_id): _NOT_FOUND for certificate_id in not_found},
+            NEGATIVE_CACHE_TIMEOUT
+        )
+        records.update(dict.fromkeys(not_found))
+    return records
+
+
+def invalidate_verification_records(certificate_ids):
+    """Drop cached records; call after any write that bypasses model signals"""
+    get_verification_cache().delete_many(
+        [verification_cache_key(certificate_id) for certificate_id in certificate_ids]
+    )
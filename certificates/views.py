@@ -1,5 +1,5 @@
-from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, HttpResponseForbidden
+from django.shortcuts import render, aget_object_or_404, get_object_or_404, redirect
+from django.http import FileResponse, HttpResponse, HttpResponseForbidden, JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth import update_session_auth_hash
@@ -10,97 +10,68 @@ from reportlab.lib import colors
 from reportlab.lib.units import inch
 from io import BytesIO
 from .models import Certificate, Course, Student
-from PIL import Image
-from reportlab.lib.utils import ImageReader
+import hmac
+import json
 import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db.models import Q
 from functools import wraps
-from django.core.cache import cache
-from django.core.exceptions import PermissionDenied
-from ipware import get_client_ip
-from django.views.decorators.csrf import ensure_csrf_cookie
-from django.views.decorators.http import require_safe
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from django.views.decorators.http import require_http_methods, require_safe
 from django.conf import settings
 import os
 from django.templatetags.static import static
-from django.contrib.staticfiles import finders
+from .rendering import get_certificate_template
+from .qr import draw_qr_code
+from .ratelimit import rate_limited
+from .metrics import collect as collect_metrics, render_prometheus
+from .verification import aget_verification_record, get_verification_record, get_verification_records
+from .pdf_cache import aget_pdf_state, aread_certificate_pdf, get_certificate_pdf, get_pdf_modified_time, get_pdf_state
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from asgiref.sync import sync_to_async
 
 def generate_certificate_pdf(certificate):
     buffer = BytesIO()
     try:
-        # Get the background image path
-        bg_image_path = finders.find('certificates/images/certificate_background.jpg')
-        if not bg_image_path:
-            raise ValueError("Certificate background image not found")
-
-        # Get exact dimensions from background image
-        with Image.open(bg_image_path) as img:
-            img_width, img_height = img.size
+        template = get_certificate_template()
 
         # Create the PDF with exact image dimensions
-        c = canvas.Canvas(buffer, pagesize=(img_width, img_height))
+        c = canvas.Canvas(buffer, pagesize=(template.width, template.height))
         
         # Draw the background image at exact size
-        c.drawImage(bg_image_path, 0, 0, img_width, img_height)
+        template.draw_background(c)
 
-        # Calculate positions relative to image dimensions
-        # Assuming standard positions as percentages of total dimensions
-        name_y = img_height * 0.37  # Position for name
-        course_y = img_height * 0.25  # Position for course name
-        dates_y = img_height * 0.125  # Position for dates
-        
         # Add only variable content
         # Add student name
-        c.setFont("Helvetica-Bold", int(img_height * 0.04))  # Dynamic font size
+        c.setFont("Helvetica-Bold", template.name_font_size)
         name = certificate.student.user.get_full_name() or certificate.student.user.email
-        c.drawCentredString(img_width/2, name_y, name)
+        c.drawCentredString(template.center_x, template.name_y, name)
         
         # Add course name
-        c.setFont("Helvetica-Bold", int(img_height * 0.035))
-        c.drawCentredString(img_width/2, course_y, certificate.course.name)
+        c.setFont("Helvetica-Bold", template.course_font_size)
+        c.drawCentredString(template.center_x, template.course_y, certificate.course.name)
         
-        # Add dates with dynamic positioning
-        dates_x = img_width * 0.27
-        dates_from_x = img_width * 0.27
-        dates_to_x = img_width * 0.45
-        c.setFont("Helvetica", int(img_height * 0.025))
+        # Add dates
+        c.setFont("Helvetica", template.dates_font_size)
         start_date = certificate.start_date.strftime('%d/%m/%Y')
         end_date = certificate.end_date.strftime('%d/%m/%Y') if certificate.end_date else "Ongoing"
-        c.drawString(dates_from_x, dates_y, f"{start_date}")
-        c.drawString(dates_to_x, dates_y, f"{end_date}")
+        c.drawString(template.dates_x, template.dates_y, f"{start_date}")
+        c.drawString(template.dates_to_x, template.dates_y, f"{end_date}")
 
         # Add grade if available
         if certificate.grade:
-            grade_y = dates_y - int(img_height * 0.035)
-            c.drawString(dates_x, grade_y, f"{certificate.grade}")
+            c.drawString(template.dates_x, template.grade_y, f"{certificate.grade}")
         
-        duration_y = dates_y - int(img_height * 0.065)
-        c.drawString(dates_x, duration_y, f"{certificate.course.duration} hours")
+        c.drawString(template.dates_x, template.duration_y, f"{certificate.course.duration} hours")
         
-        # Add certificate ID at bottom with dynamic positioning
-        c.setFont("Helvetica", int(img_height * 0.015))
+        # Add certificate ID at bottom
+        c.setFont("Helvetica", template.id_font_size)
         c.setFillColor(colors.gray)
-        c.drawString(img_width * 0.05, img_height * 0.04, f"Certificate ID: {certificate.certificate_id}")
-        
-        # Add QR code with white background
-        qr_code = certificate.get_qr_code()
-        qr_image_buffer = BytesIO()
-        qr_size = int(img_height * 0.15)  # QR code size relative to image height
+        c.drawString(template.id_x, template.id_y, f"Certificate ID: {certificate.certificate_id}")
         
-        with Image.open(BytesIO(qr_code)) as qr_image:
-            # Create a white background
-            bg = Image.new('RGBA', qr_image.size, 'white')
-            # Paste the QR code onto the white background
-            bg.paste(qr_image)
-            bg.save(qr_image_buffer, format='PNG')
-            qr_image_buffer.seek(0)
-            qr_image_reader = ImageReader(qr_image_buffer)
-            # Draw the QR code at the bottom right
-            c.drawImage(qr_image_reader, 
-                       img_width - (qr_size * 9), 
-                       img_height * 0.07, 
-                       width=qr_size, 
-                       height=qr_size, 
-                       mask='auto')
+        # Add QR code with white background at the bottom right
+        draw_qr_code(c, certificate.get_qr_matrix(), template.qr_x, template.qr_y, template.qr_size)
         
         # Close the PDF object cleanly
         c.showPage()
@@ -110,44 +81,87 @@ def generate_certificate_pdf(certificate):
     finally:
         buffer.close()
 
-@login_required
-def view_certificate(request, certificate_id):
-    try:
-        uuid_id = uuid.UUID(certificate_id)
-        certificate = get_object_or_404(Certificate, certificate_id=uuid_id)
-    except ValueError:
-        return HttpResponseForbidden("Invalid certificate ID format.")
-      # Check if certificate is valid
+def certificate_access_error(user, certificate):
+    """Forbidden response if the user may not view the certificate, else None"""
+    # Check if certificate is valid
     if not certificate.is_valid:
         return HttpResponseForbidden("This certificate has been marked as invalid and cannot be viewed.")
     
     # Check if the user has permission to view this certificate
-    if not request.user.is_staff and request.user != certificate.student.user:
+    if not user.is_staff and user != certificate.student.user:
         return HttpResponseForbidden("You don't have permission to view this certificate.")
-    
-    # Generate PDF
-    pdf = generate_certificate_pdf(certificate)
-      # Create the HttpResponse object with PDF headers
-    response = HttpResponse(content_type='application/pdf')
+    return None
+
+def add_pdf_headers(response, certificate, last_modified):
     filename = f'certificate_{certificate.course.name}_{certificate.student.user.email}.pdf'
     response['Content-Disposition'] = f'inline; filename="{filename}"'
-    response.write(pdf)
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+
+def conditional_pdf_response(request, etag, last_modified):
+    """304/412 response for a revalidation of the stored PDF, or None to send it"""
+    # Last-Modified is sent with whole seconds, so compare with those
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+@rate_limited('view_certificate', '30/m')
+@login_required
+def view_certificate(request, certificate_id):
+    try:
+        uuid_id = uuid.UUID(certificate_id)
+        certificate = get_object_or_404(
+            Certificate.objects.select_related('student__user', 'course'),
+            certificate_id=uuid_id
+        )
+    except ValueError:
+        return HttpResponseForbidden("Invalid certificate ID format.")
+    denied = certificate_access_error(request.user, certificate)
+    if denied:
+        return denied
     
+    # The render fingerprint doubles as the ETag, so unchanged
+    # certificates are answered without touching the PDF at all
+    fingerprint, last_modified = get_pdf_state(certificate)
+    etag = quote_etag(fingerprint)
+    response = conditional_pdf_response(request, etag, last_modified)
+    if response is None:
+        # Serve the cached render, generating it on the first view
+        pdf_file = get_certificate_pdf(certificate, fingerprint)
+        response = FileResponse(pdf_file, content_type='application/pdf')
+        add_pdf_headers(response, certificate, last_modified or get_pdf_modified_time(certificate, fingerprint))
+
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
     return response
 
-def rate_limit(request, key_prefix, max_requests=60, timeout=60):
-    """Rate limit based on IP address"""
-    client_ip, _ = get_client_ip(request)
-    if not client_ip:
-        raise PermissionDenied("Cannot determine client IP address.")
-    
-    cache_key = f"rate_limit:{key_prefix}:{client_ip}"
-    requests = cache.get(cache_key, 0)
-    
-    if requests >= max_requests:
-        raise PermissionDenied("Too many requests. Please try again later.")
-    
-    cache.set(cache_key, requests + 1, timeout)
+@rate_limited('view_certificate', '30/m')
+@login_required
+async def aview_certificate(request, certificate_id):
+    """view_certificate for ASGI; renders in the bounded render pool, off the event loop"""
+    try:
+        uuid_id = uuid.UUID(certificate_id)
+    except ValueError:
+        return HttpResponseForbidden("Invalid certificate ID format.")
+    certificate = await aget_object_or_404(
+        Certificate.objects.select_related('student__user', 'course'),
+        certificate_id=uuid_id
+    )
+    denied = certificate_access_error(await request.auser(), certificate)
+    if denied:
+        return denied
+
+    fingerprint, last_modified = await aget_pdf_state(certificate)
+    etag = quote_etag(fingerprint)
+    response = conditional_pdf_response(request, etag, last_modified)
+    if response is None:
+        # Read into memory; a file iterator would be drained synchronously under ASGI
+        pdf, stored_at = await aread_certificate_pdf(certificate, fingerprint)
+        response = HttpResponse(pdf, content_type='application/pdf')
+        add_pdf_headers(response, certificate, last_modified or stored_at)
+
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 def get_validity_message(certificate):
     """Generate a message about certificate validity"""
@@ -164,24 +178,21 @@ def get_validity_message(certificate):
         'details': f"Course period: {certificate.start_date.strftime('%B %d, %Y')} - {certificate.end_date.strftime('%B %d, %Y') if certificate.end_date else 'Ongoing'}"
     }
 
-@require_safe
-@ensure_csrf_cookie
-def verify(request):
-    certificate = None
+def verify_context(certificate_id):
+    """Context of the verify page for a requested id, and the UUID to look up if it is well-formed"""
     context = {
         'error': None,
         'error_type': None,
         'certificate_id': None
     }
     
-    certificate_id = request.GET.get('certificate_id')
     if not certificate_id:
         context.update({
             'error_type': 'missing_id',
             'error': "No certificate ID was provided.",
             'help_text': "Please provide a valid certificate ID in the URL."
         })
-        return render(request, 'certificates/verify.html', context)
+        return context, None
 
     context['certificate_id'] = certificate_id
     
@@ -193,10 +204,11 @@ def verify(request):
             'error': "The provided certificate ID is not in the correct format.",
             'help_text': "Certificate IDs should be in UUID format. Please check if you copied the complete ID."
         })
-        return render(request, 'certificates/verify.html', context)
-    
-    try:
-        certificate = Certificate.objects.get(certificate_id=certificate_uuid)
+        return context, None
+    return context, certificate_uuid
+
+def add_verification_result(context, certificate):
+    if certificate is not None:
         # Get detailed validity status
         validity_info = get_validity_message(certificate)
         is_valid = validity_info['status'] == 'valid'
@@ -206,15 +218,105 @@ def verify(request):
             'is_valid': is_valid,
             'validity_info': validity_info,
         })
-    except Certificate.DoesNotExist:
+    else:
         context.update({
             'error_type': 'not_found',
             'error': "The requested certificate could not be found in our system.",
             'help_text': "Please verify that you have entered the correct certificate ID. If you believe this is an error, contact the issuing authority."
         })
-    
+
+@rate_limited('verify', '60/m')
+@require_safe
+@ensure_csrf_cookie
+def verify(request):
+    context, certificate_uuid = verify_context(request.GET.get('certificate_id'))
+    if certificate_uuid is not None:
+        # Served from the verification cache; a single joined query on a miss
+        add_verification_result(context, get_verification_record(certificate_uuid))
     return render(request, 'certificates/verify.html', context)
 
+@rate_limited('verify', '60/m')
+@require_safe
+@ensure_csrf_cookie
+async def averify(request):
+    """verify for ASGI"""
+    context, certificate_uuid = verify_context(request.GET.get('certificate_id'))
+    if certificate_uuid is not None:
+        add_verification_result(context, await aget_verification_record(certificate_uuid))
+    # The templates read the lazy request.user and session, which may
+    # query the database, so render in the request's sync thread
+    return await sync_to_async(render)(request, 'certificates/verify.html', context)
+
+def verification_result(certificate_id, record):
+    """Compact JSON-ready verification result for the API"""
+    if record is None:
+        return {'certificate_id': certificate_id, 'found': False, 'status': 'not_found'}
+    result = {
+        'certificate_id': str(record.certificate_id),
+        'found': True,
+        'student_name': record.student_name,
+        'course': record.course_name,
+        'grade': record.grade,
+        'issue_date': record.issue_date.date().isoformat(),
+        'start_date': record.start_date.date().isoformat(),
+        'end_date': record.end_date.date().isoformat() if record.end_date else None,
+    }
+    result.update(get_validity_message(record))
+    return result
+
+@csrf_exempt
+@rate_limited('api_verify', '30/m')
+@require_http_methods(['GET', 'HEAD', 'POST'])
+def api_verify(request):
+    """Verify one certificate (GET ?certificate_id=) or a batch (POST {"certificate_ids": [...]})"""
+    if request.method == 'POST':
+        try:
+            certificate_ids = json.loads(request.body)['certificate_ids']
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'Expected a JSON body with a "certificate_ids" list.'}, status=400)
+        if not isinstance(certificate_ids, list) or not all(isinstance(i, str) for i in certificate_ids):
+            return JsonResponse({'error': '"certificate_ids" must be a list of strings.'}, status=400)
+        max_batch = getattr(settings, 'VERIFY_API_MAX_BATCH', 100)
+        if len(certificate_ids) > max_batch:
+            return JsonResponse({'error': f'At most {max_batch} certificate IDs per request.'}, status=400)
+    else:
+        certificate_id = request.GET.get('certificate_id')
+        if not certificate_id:
+            return JsonResponse({'error': 'No certificate ID was provided.'}, status=400)
+        certificate_ids = [certificate_id]
+
+    parsed = {}
+    for certificate_id in certificate_ids:
+        try:
+            parsed[certificate_id] = uuid.UUID(certificate_id)
+        except ValueError:
+            parsed[certificate_id] = None
+    records = get_verification_records(uuid_id for uuid_id in parsed.values() if uuid_id)
+
+    results = []
+    for certificate_id in certificate_ids:
+        uuid_id = parsed[certificate_id]
+        if uuid_id is None:
+            results.append({'certificate_id': certificate_id, 'found': False, 'status': 'invalid_format'})
+        else:
+            results.append(verification_result(certificate_id, records[uuid_id]))
+
+    if request.method == 'POST':
+        return JsonResponse({'results': results})
+    return JsonResponse(results[0])
+
+@require_safe
+def metrics(request):
+    """Request metrics of every worker in Prometheus text format.
+
+    For staff users, or for scrapers sending "Authorization: Bearer <METRICS_TOKEN>".
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not request.user.is_staff and not (token and hmac.compare_digest(authorization, f'Bearer {token}')):
+        return HttpResponseForbidden("Staff only.")
+    return HttpResponse(render_prometheus(*collect_metrics()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 def home(request):
     return render(request, 'certificates/home.html')
 
@@ -246,20 +348,57 @@ def password_change_required(view_func):
     @wraps(view_func)
     def _wrapped_view(request, *args, **kwargs):
         if request.user.is_authenticated:
+            # StudentModelBackend loads the profile together with the user
             try:
-                student = Student.objects.get(user=request.user)
-                if student.require_password_change:
-                    return redirect('certificates:password_change')
+                student = request.user.student
             except Student.DoesNotExist:
-                pass
+                student = None
+            if student is not None and student.require_password_change:
+                return redirect('certificates:password_change')
         return view_func(request, *args, **kwargs)
     return _wrapped_view
 
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+def make_dashboard_cursor(certificate):
+    """Keyset cursor '<issue_date in epoch microseconds>_<pk>' pointing after a certificate"""
+    return f"{(certificate.issue_date - EPOCH) // timedelta(microseconds=1)}_{certificate.pk}"
+
+def parse_dashboard_cursor(cursor):
+    """Split a dashboard keyset cursor, or return None if it is missing or malformed"""
+    try:
+        microseconds, pk = cursor.split('_')
+        return EPOCH + timedelta(microseconds=int(microseconds)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
 # Update existing views to use the password_change_required decorator
 @login_required
 @password_change_required
 def dashboard(request):
-    certificates = Certificate.objects.filter(student__user=request.user).order_by('-issue_date')
+    page_size = getattr(settings, 'DASHBOARD_PAGE_SIZE', 20)
+    certificates = (
+        Certificate.objects.filter(student__user=request.user)
+        .select_related('course')
+        .only('certificate_id', 'issue_date', 'is_valid', 'course__name')
+        .order_by('-issue_date', '-pk')
+    )
+    # Keyset pagination: continue after the last certificate of the previous page
+    cursor = parse_dashboard_cursor(request.GET.get('after'))
+    if cursor:
+        issue_date, pk = cursor
+        certificates = certificates.filter(
+            Q(issue_date__lt=issue_date) | Q(issue_date=issue_date, pk__lt=pk)
+        )
+    certificates = list(certificates[:page_size + 1])
+
+    next_cursor = None
+    if len(certificates) > page_size:
+        certificates = certificates[:page_size]
+        next_cursor = make_dashboard_cursor(certificates[-1])
+
     return render(request, 'certificates/dashboard.html', {
-        'certificates': certificates
+        'certificates': certificates,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
     })
@@ -9,6 +9,28 @@ import dj_database_url
 # Load environment variables from .env file
 load_dotenv()
 
+
+def cache_config(url):
+    """Build a CACHES entry from a URL.
+
+    redis://host:port/db and memcached://host:port use a shared server;
+    db://table stores entries in the database (run createcachetable) and
+    file:///path on local disk, both shared by every worker on the box;
+    locmem:// keeps a private cache per process.
+    """
+    scheme, _, rest = url.partition('://')
+    if scheme in ('redis', 'rediss'):
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    if scheme in ('memcached', 'pymemcache'):
+        return {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache', 'LOCATION': rest}
+    if scheme == 'db':
+        return {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': rest or 'certifier_cache'}
+    if scheme == 'file':
+        return {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': rest}
+    if scheme == 'locmem':
+        return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': rest}
+    raise ValueError(f"Unsupported CACHE_URL scheme: {scheme}")
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
@@ -41,6 +63,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    'certificates.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -70,6 +94,12 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'certifier.wsgi.application'
 
+# StudentModelBackend is a ModelBackend, so listing the stock one as well
+# would hash every failed login twice (migration 0008 moved old sessions)
+AUTHENTICATION_BACKENDS = [
+    'certificates.backends.StudentModelBackend',
+]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -128,3 +158,88 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Session settings
 SESSION_COOKIE_AGE = 86400  # 24 hours in seconds
+
+# Rendered certificate PDF cache
+CERTIFICATE_PDF_CACHE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+CERTIFICATE_PDF_CACHE_OPTIONS = {
+    'location': MEDIA_ROOT / 'certificate_pdfs',
+}
+# Route verify and view_certificate to their async variants (set by asgi.py),
+# which render PDFs in a pool of CERTIFICATE_PDF_RENDER_WORKERS threads per process
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+CERTIFICATE_PDF_RENDER_WORKERS = int(os.getenv('CERTIFICATE_PDF_RENDER_WORKERS', 4))
+if ASYNC_VIEWS:
+    # WhiteNoise is sync-only and would force every middleware above it, the
+    # request metrics included, onto the sync path; outermost, it costs one
+    # thread hop per request and leaves the rest of the stack async
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+    MIDDLEWARE.insert(0, 'whitenoise.middleware.WhiteNoiseMiddleware')
+
+# Batch certificate rendering (defaults to one worker per CPU)
+CERTIFICATE_RENDER_WORKERS = int(os.getenv('CERTIFICATE_RENDER_WORKERS', 0)) or None
+CERTIFICATE_RENDER_CHUNK_SIZE = int(os.getenv('CERTIFICATE_RENDER_CHUNK_SIZE', 20))
+
+# Background jobs (run by `manage.py run_worker`). Admin actions on more
+# than JOB_BACKGROUND_THRESHOLD objects are queued instead of run in the request.
+JOB_BACKGROUND_THRESHOLD = int(os.getenv('JOB_BACKGROUND_THRESHOLD', 200))
+# Running jobs older than this (seconds) are presumed dead and may be requeued from the admin
+JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', 60 * 60 * 6))
+JOB_RESULT_STORAGE = 'django.core.files.storage.FileSystemStorage'
+JOB_RESULT_OPTIONS = {
+    'location': MEDIA_ROOT / 'job_results',
+}
+# Seconds job result files (exports, temporary passwords) are kept; password
+# files are also deleted on their first download
+JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', 60 * 60 * 24))
+
+# Processes hashing passwords for bulk student operations (defaults to one per CPU)
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 0)) or None
+
+# In-memory filter of issued certificate ids used by verify to answer
+# unknown ids without a database query. Only enable with a shared cache:
+# processes learn about new certificates through a cache key.
+CERTIFICATE_ID_FILTER_ENABLED = os.getenv('CERTIFICATE_ID_FILTER_ENABLED', 'False') == 'True'
+CERTIFICATE_ID_FILTER_REFRESH = 60 * 60
+
+# Maximum number of certificate IDs accepted by one verification API call
+VERIFY_API_MAX_BATCH = 100
+
+# Bearer token letting a Prometheus scraper read /metrics/ without a staff login
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Per-view request budgets per client IP ('<count>/<period>', period s/m/h/d).
+# RATE_LIMITS_ENABLED=False turns them off, e.g. for load tests from one machine.
+RATE_LIMITS_ENABLED = os.getenv('RATE_LIMITS_ENABLED', 'True') == 'True'
+RATE_LIMITS = {
+    'verify': '60/m',
+    'api_verify': '30/m',
+    'view_certificate': '30/m',
+}
+
+# Caches. The default cache is shared by all workers so rate limits and
+# login protection hold across processes. Production should use Redis or
+# Memcached (it warns otherwise); the database fallback here works
+# everywhere, including tests, but its incr() is not atomic under heavy
+# concurrency.
+CACHES = {
+    'default': cache_config(os.getenv('CACHE_URL', 'db://certifier_cache')),
+    # Hot read-mostly keys (verification records) kept briefly in process memory
+    'verification': {
+        'BACKEND': 'certificates.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'default',
+            'LOCAL_TIMEOUT': 5,
+            'LOCAL_MAX_ENTRIES': 1000,
+        },
+    },
+}
+
+# Login brute-force protection: after LOGIN_FAILURE_LIMIT failures from an
+# IP or for a username, logins are refused for LOGIN_LOCKOUT_BASE seconds,
+# doubling with every further failure up to LOGIN_LOCKOUT_MAX
+LOGIN_FAILURE_LIMIT = 5
+LOGIN_LOCKOUT_BASE = 60
+LOGIN_LOCKOUT_MAX = 60 * 60 * 24
+
+# Certificates per page on the student dashboard
+DASHBOARD_PAGE_SIZE = 20
@@ -19,6 +19,9 @@ DATABASES = {
     }
 }
 
+# Per-process cache unless CACHE_URL points at a shared one
+CACHES['default'] = cache_config(os.getenv('CACHE_URL', 'locmem://'))
+
 # Email settings - Console backend for development
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
@@ -43,4 +46,10 @@ LOGGING = {
         'handlers': ['console'],
         'level': 'INFO',
     },
+    'loggers': {
+        # Per-request JSON lines from RequestMetricsMiddleware; set to INFO to see them
+        'certificates.requests': {
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'WARNING'),
+        },
+    },
 }
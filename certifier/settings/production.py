@@ -1,6 +1,8 @@
 """
 Production settings for Render.com deployment
 """
+import logging
+
 from .base import *
 
 # SECURITY WARNING: keep the secret key used in production secret!
@@ -23,6 +25,18 @@ DATABASES = {
     )
 }
 
+# Rate limits and login protection count in the default cache, and only
+# Redis and Memcached increment atomically across workers. The database
+# cache (the default, needs createcachetable) still works but can lose
+# concurrent increments, letting a few extra attempts through.
+CACHE_URL = os.getenv('CACHE_URL', 'db://certifier_cache')
+if not CACHE_URL.startswith(('redis://', 'rediss://', 'memcached://', 'pymemcache://')):
+    logging.getLogger('certifier').warning(
+        "CACHE_URL is not a redis:// or memcached:// server; rate limits and "
+        "login lockouts may undercount under concurrent requests."
+    )
+CACHES['default'] = cache_config(CACHE_URL)
+
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.getenv('EMAIL_HOST', '')
@@ -60,5 +74,11 @@ LOGGING = {
             'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO'),
             'propagate': False,
         },
+        # One JSON line per request from RequestMetricsMiddleware
+        'certificates.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
     },
 }
@@ -18,19 +18,19 @@ from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
 from django.shortcuts import redirect
-from certificates.security import admin_brute_force_protect
+from certificates.security import brute_force_protect
 from django.contrib.admin.sites import AdminSite
 
 def redirect_to_home(request):
     return redirect('certificates:home')
 
 # Add rate limiting to admin views
-admin.site.login = admin_brute_force_protect(admin.site.login)
+admin.site.login = brute_force_protect(admin.site.login)
 
 urlpatterns = [
     path('', redirect_to_home, name='root'),
     path('admin/', admin.site.urls),
     path('certificates/', include('certificates.urls')),
-    path('login/', auth_views.LoginView.as_view(template_name='certificates/login.html', redirect_authenticated_user=True), name='login'),
+    path('login/', brute_force_protect(auth_views.LoginView.as_view(template_name='certificates/login.html', redirect_authenticated_user=True)), name='login'),
     path('logout/', auth_views.LogoutView.as_view(template_name='certificates/logged_out.html'), name='logout'),
 ]